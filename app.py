@@ -3,17 +3,74 @@ AIFI智能财报系统 - Flask主应用
 """
 
 from flask import Flask, render_template, request, jsonify, send_file, session, redirect, url_for, flash
-from werkzeug.utils import secure_filename
+from flask.json.provider import JSONProvider
 from werkzeug.security import generate_password_hash, check_password_hash
-from functools import wraps
+from functools import wraps, lru_cache
 import os
-import json
-from datetime import datetime
+import sys
+import time
+import atexit
+import signal
+import hashlib
+import hmac
+import secrets
+import shutil
+import mmap
+import threading
+import logging
+import orjson
+import bisect
+from concurrent.futures import ThreadPoolExecutor
+from collections import deque, OrderedDict
+from urllib.parse import quote, unquote
 from config import Config
+from storage import (REPORTS_DIR, REPORTS_STORAGE_FILE, ORJSON_OPTIONS, json_default, write_file_atomic,
+                     remove_file, report_id_from_filename, get_report_path, read_report_file,
+                     write_report_file)
 from modules.report_generator import ReportGenerator
 from modules.export_generator import ExportGenerator
+from modules.ai_analyzer import AIAnalyzer
+
+try:
+    import ijson  # 可选依赖：超大报告存储文件的流式加载
+except ImportError:
+    ijson = None
+
+try:
+    # 可选依赖：argon2密码哈希，未安装时使用Werkzeug默认算法
+    from argon2 import PasswordHasher
+    from argon2.exceptions import VerificationError, InvalidHashError
+    _password_hasher = PasswordHasher(time_cost=2, memory_cost=19456, parallelism=1)
+except ImportError:
+    _password_hasher = None
+
+logger = logging.getLogger(__name__)
+
+class ORJSONProvider(JSONProvider):
+    """使用orjson序列化jsonify响应和模板中的tojson，原生支持numpy类型和年份等非字符串键"""
+    
+    def dumps(self, obj, **kwargs):
+        return self.dumps_bytes(obj).decode('utf-8')
+    
+    @staticmethod
+    def dumps_bytes(obj):
+        """序列化为bytes，与存储文件使用相同的orjson选项"""
+        return orjson.dumps(obj, default=json_default, option=ORJSON_OPTIONS)
+    
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+    
+    def response(self, *args, **kwargs):
+        # 参数规则与jsonify相同：单个位置参数、多个位置参数（列表）或关键字参数（字典）
+        if args and kwargs:
+            raise TypeError('jsonify() 不能同时传入位置参数和关键字参数')
+        obj = args[0] if len(args) == 1 else (args or kwargs or None)
+        # 直接使用orjson输出的bytes作为响应体，省去decode后再encode的一次复制
+        return self._app.response_class(self.dumps_bytes(obj), mimetype='application/json')
+
 
 app = Flask(__name__)
+app.json = ORJSONProvider(app)
 app.config.from_object(Config)
 
 # 初始化目录
@@ -22,56 +79,282 @@ Config.init_app()
 # 存储报告数据（实际生产环境应使用数据库）
 report_storage = {}
 
-# 操作记录
-operation_logs = []
+# 报告按创建者索引：{用户名: {报告ID, ...}}
+reports_by_user = {}
+
+# 企业名称 -> 报告数量，用于仪表板统计企业数时无需遍历全部报告
+_company_report_counts = {}
+
+# 按生成时间升序排列的 (generated_at, 报告ID) 索引，增删时用二分维护，报告列表无需每次排序
+_sorted_reports = []
+# 同样的有序索引按用户划分：{用户名: [(generated_at, 报告ID), ...]}
+_sorted_reports_by_user = {}
+
+# 上传文件内容哈希索引：{(用户名, 文件哈希): 报告ID}，用于跳过重复上传的报告生成
+_hash_to_report = {}
+
+# 保护以上所有报告索引的增删，同一报告的各索引整体更新；可重入，重建索引时可嵌套调用index_report
+_report_index_lock = threading.RLock()
+
+# 操作记录（仅保留最近的记录，避免长期运行时内存无限增长；完整记录追加写入日志文件）
+operation_logs = deque(maxlen=Config.OPERATION_LOGS_MAX)
+
+# 尚未写入日志文件的操作记录
+_unsaved_logs = deque()
 
 # 下载记录
 download_records = []
 
-# 报告持久化存储文件
-REPORTS_STORAGE_FILE = os.path.join(Config.DATA_FOLDER, 'reports_storage.json')
+# 下载记录按用户索引：{用户名: [下载记录, ...]}
+downloads_by_user = {}
+
 USERS_STORAGE_FILE = os.path.join(Config.DATA_FOLDER, 'users.json')
 DOWNLOAD_RECORDS_FILE = os.path.join(Config.DATA_FOLDER, 'download_records.json')
+OPERATION_LOGS_FILE = os.path.join(Config.DATA_FOLDER, 'operation_logs.jsonl')
+OPERATION_LOGS_BACKUP_FILE = OPERATION_LOGS_FILE + '.1'
+
 
 # 加载历史报告
 def load_reports():
     """从文件加载历史报告"""
     global report_storage
-    if os.path.exists(REPORTS_STORAGE_FILE):
+    if os.path.isdir(REPORTS_DIR):
+        report_storage = {}
         try:
-            with open(REPORTS_STORAGE_FILE, 'r', encoding='utf-8') as f:
-                report_storage = json.load(f)
+            with os.scandir(REPORTS_DIR) as entries:
+                names = [entry.name for entry in entries
+                         if report_id_from_filename(entry.name) and entry.is_file()]
+            # 多线程读取报告文件，磁盘I/O期间释放GIL，报告较多时缩短启动时间
+            with ThreadPoolExecutor(max_workers=8, thread_name_prefix='aifi-load') as executor:
+                for name, report in zip(names, executor.map(read_report_file, names)):
+                    if report is not None:
+                        report_storage[report_id_from_filename(name)] = report
             print(f"✓ 已加载 {len(report_storage)} 个历史报告")
         except Exception as e:
             print(f"✗ 加载历史报告失败: {str(e)}")
-            report_storage = {}
+    elif os.path.exists(REPORTS_STORAGE_FILE):
+        load_legacy_reports()
+    
+    # 报告入库后不再修改，加载时统一规范化一次，查看/导出时无需重复处理
+    for report in report_storage.values():
+        normalize_report_data(report)
+    rebuild_report_index()
+
+
+def load_json_mmap(f):
+    """
+    通过内存映射解析JSON文件，由内核按需调页，无需先把整个文件读入一份bytes
+    
+    空文件或不支持mmap时回退为普通读取。
+    """
+    try:
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (ValueError, OSError):
+        return orjson.loads(f.read())
+    with mm:
+        view = memoryview(mm)
+        try:
+            return orjson.loads(view)
+        finally:
+            view.release()
+
+
+def load_legacy_reports():
+    """从旧版单文件存储加载报告，并迁移为每个报告一个文件"""
+    global report_storage
+    try:
+        file_size = os.path.getsize(REPORTS_STORAGE_FILE)
+        with open(REPORTS_STORAGE_FILE, 'rb') as f:
+            if ijson is not None and file_size > Config.REPORTS_STREAM_LOAD_MB * 1024 * 1024:
+                # 大文件流式解析，避免文本与解析结果同时驻留内存
+                report_storage = {}
+                for report_id, report_data in ijson.kvitems(f, '', use_float=True):
+                    report_storage[report_id] = report_data
+            else:
+                report_storage = load_json_mmap(f)
+        print(f"✓ 已加载 {len(report_storage)} 个历史报告")
+    except Exception as e:
+        print(f"✗ 加载历史报告失败: {str(e)}")
+        report_storage = {}
+        return
+    
+    # 迁移到按报告存储的目录（旧文件保留作为备份）
+    try:
+        write_reports_dir()
+        print(f"✓ 已迁移报告存储至 {REPORTS_DIR}")
+    except Exception:
+        # 迁移失败时仍使用已加载的报告，目录不存在，下次保存或启动时重试
+        logger.exception('✗ 迁移报告存储失败')
+
+
+def rebuild_report_index():
+    """根据report_storage重建按用户的报告索引"""
+    with _report_index_lock:
+        reports_by_user.clear()
+        _hash_to_report.clear()
+        _company_report_counts.clear()
+        _sorted_reports.clear()
+        _sorted_reports_by_user.clear()
+        for report_id, report in report_storage.items():
+            index_report(report_id, report)
+
+
+def _sorted_report_key(report_id, report):
+    """报告在按生成时间排序索引中的键"""
+    return (report.get('generated_at', '未知时间'), report_id)
+
+
+def index_report(report_id, report):
+    """将报告加入按用户的索引"""
+    company_name = report.get('basic_info', {}).get('企业名称', '')
+    file_hash = report.get('file_hash')
+    key = _sorted_report_key(report_id, report)
+    with _report_index_lock:
+        reports_by_user.setdefault(report.get('created_by'), set()).add(report_id)
+        if company_name:
+            _company_report_counts[company_name] = _company_report_counts.get(company_name, 0) + 1
+        if file_hash:
+            _hash_to_report[(report.get('created_by'), file_hash)] = report_id
+        bisect.insort(_sorted_reports, key)
+        bisect.insort(_sorted_reports_by_user.setdefault(report.get('created_by'), []), key)
+
+
+def unindex_report(report_id, report):
+    """将报告从按用户的索引中移除"""
+    company_name = report.get('basic_info', {}).get('企业名称', '')
+    file_hash = report.get('file_hash')
+    key = _sorted_report_key(report_id, report)
+    with _report_json_cache_lock:
+        _report_json_cache.pop(report_id, None)
+    with _report_index_lock:
+        user_reports = reports_by_user.get(report.get('created_by'))
+        if user_reports is not None:
+            user_reports.discard(report_id)
+            if not user_reports:
+                del reports_by_user[report.get('created_by')]
+        if company_name in _company_report_counts:
+            _company_report_counts[company_name] -= 1
+            if _company_report_counts[company_name] <= 0:
+                del _company_report_counts[company_name]
+        if file_hash and _hash_to_report.get((report.get('created_by'), file_hash)) == report_id:
+            del _hash_to_report[(report.get('created_by'), file_hash)]
+        _remove_sorted(_sorted_reports, key)
+        user_sorted = _sorted_reports_by_user.get(report.get('created_by'))
+        if user_sorted is not None:
+            _remove_sorted(user_sorted, key)
+            if not user_sorted:
+                del _sorted_reports_by_user[report.get('created_by')]
+
+
+def _remove_sorted(sorted_list, key):
+    """从有序列表中二分查找并删除指定键"""
+    i = bisect.bisect_left(sorted_list, key)
+    if i < len(sorted_list) and sorted_list[i] == key:
+        del sorted_list[i]
+
+
+# 待写入和待删除的报告ID
+_dirty_reports = set()
+_deleted_reports = set()
+_reports_dirty_lock = threading.Lock()
+
+
+def write_reports_dir():
+    """
+    将全部报告写入临时目录，全部写完后再整体替换为报告目录
+    
+    加载时以报告目录是否存在判断是否已迁移，中途失败或进程退出不会留下只含部分报告的目录。
+    """
+    tmp_dir = f"{REPORTS_DIR}.tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+    for report_id, report in list(report_storage.items()):
+        write_report_file(report_id, report, directory=tmp_dir)
+    os.replace(tmp_dir, REPORTS_DIR)
+
+
+def mark_report_saved(report_id):
+    """标记报告需要写入文件，由后台线程批量保存"""
+    with _reports_dirty_lock:
+        _deleted_reports.discard(report_id)
+        _dirty_reports.add(report_id)
+    schedule_save('reports')
+
+
+def mark_report_deleted(report_id):
+    """标记报告文件需要删除，由后台线程批量处理"""
+    with _reports_dirty_lock:
+        _dirty_reports.discard(report_id)
+        _deleted_reports.add(report_id)
+    schedule_save('reports')
+
 
 # 保存报告到文件
 def save_reports():
-    """保存报告到文件"""
+    """写入有改动的报告文件、删除已删除报告的文件"""
+    with _reports_dirty_lock:
+        dirty = set(_dirty_reports)
+        deleted = set(_deleted_reports)
+        _dirty_reports.clear()
+        _deleted_reports.clear()
+    if not dirty and not deleted:
+        return True
+    
     try:
-        # 自定义JSON编码器，处理numpy类型
-        import numpy as np
-        
-        class NumpyEncoder(json.JSONEncoder):
-            def default(self, obj):
-                if isinstance(obj, (np.int_, np.intc, np.intp, np.int8,
-                    np.int16, np.int32, np.int64, np.uint8,
-                    np.uint16, np.uint32, np.uint64)):
-                    return int(obj)
-                elif isinstance(obj, (np.float_, np.float16, np.float32, np.float64)):
-                    return float(obj)
-                elif isinstance(obj, (np.ndarray,)):
-                    return obj.tolist()
-                return super(NumpyEncoder, self).default(obj)
-        
-        with open(REPORTS_STORAGE_FILE, 'w', encoding='utf-8') as f:
-            json.dump(report_storage, f, ensure_ascii=False, indent=2, cls=NumpyEncoder)
+        if not os.path.isdir(REPORTS_DIR):
+            # 报告目录尚未建立（首次启动或迁移未完成），整体写入全部报告
+            write_reports_dir()
+            return True
+        for report_id in deleted:
+            remove_file(get_report_path(report_id))
+            remove_file(get_report_path(report_id, compressed=True))
+        for report_id in dirty:
+            report = report_storage.get(report_id)
+            if report is not None:
+                write_report_file(report_id, report)
         return True
+    except Exception:
+        logger.exception('✗ 保存报告失败')
+        # 写入失败的报告留待下次重试
+        with _reports_dirty_lock:
+            _dirty_reports.update(dirty - _deleted_reports)
+            _deleted_reports.update(deleted - _dirty_reports)
+        return False
+
+# 加载操作日志
+def load_operation_logs():
+    """从日志文件加载最近的操作记录（刚轮转过时从备份文件补足）"""
+    try:
+        # 只保留文件末尾的记录，不必解析整个历史
+        lines = deque(maxlen=operation_logs.maxlen)
+        for path in (OPERATION_LOGS_BACKUP_FILE, OPERATION_LOGS_FILE):
+            if os.path.exists(path):
+                with open(path, 'rb') as f:
+                    lines.extend(f)
+        operation_logs.extend(orjson.loads(line) for line in lines if line.strip())
+        if operation_logs:
+            print(f"✓ 已加载 {len(operation_logs)} 条操作记录")
     except Exception as e:
-        print(f"✗ 保存报告失败: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        print(f"✗ 加载操作记录失败: {str(e)}")
+
+# 保存操作日志
+def save_operation_logs():
+    """将新增的操作记录以JSON Lines格式追加到日志文件"""
+    lines = []
+    while _unsaved_logs:
+        lines.append(orjson.dumps(_unsaved_logs.popleft(), default=json_default))
+    if not lines:
+        return True
+    try:
+        with open(OPERATION_LOGS_FILE, 'ab') as f:
+            f.write(b'\n'.join(lines) + b'\n')
+            size = f.tell()
+        # 日志文件超过上限时轮转，只保留一个备份，避免文件无限增长
+        if size > Config.OPERATION_LOGS_FILE_MAX_MB * 1024 * 1024:
+            os.replace(OPERATION_LOGS_FILE, OPERATION_LOGS_BACKUP_FILE)
+        return True
+    except Exception as e:
+        print(f"✗ 保存操作记录失败: {str(e)}")
         return False
 
 # 加载下载记录
@@ -80,54 +363,125 @@ def load_download_records():
     global download_records
     if os.path.exists(DOWNLOAD_RECORDS_FILE):
         try:
-            with open(DOWNLOAD_RECORDS_FILE, 'r', encoding='utf-8') as f:
-                download_records = json.load(f)
+            with open(DOWNLOAD_RECORDS_FILE, 'rb') as f:
+                download_records = load_json_mmap(f)
             print(f"✓ 已加载 {len(download_records)} 条下载记录")
         except Exception as e:
             print(f"✗ 加载下载记录失败: {str(e)}")
             download_records = []
+    rebuild_download_index()
+
+
+def rebuild_download_index():
+    """根据download_records重建按用户的下载记录索引"""
+    downloads_by_user.clear()
+    for record in download_records:
+        downloads_by_user.setdefault(record.get('username'), []).append(record)
 
 # 保存下载记录
 def save_download_records():
     """保存下载记录到文件"""
     try:
-        with open(DOWNLOAD_RECORDS_FILE, 'w', encoding='utf-8') as f:
-            json.dump(download_records, f, ensure_ascii=False, indent=2)
+        write_file_atomic(DOWNLOAD_RECORDS_FILE, orjson.dumps(download_records, default=json_default, option=ORJSON_OPTIONS))
         return True
     except Exception as e:
         print(f"✗ 保存下载记录失败: {str(e)}")
         return False
 
+# ========== 密码哈希 ==========
+
+def hash_password(password):
+    """生成密码哈希，优先使用argon2"""
+    if _password_hasher is not None:
+        return _password_hasher.hash(password)
+    return generate_password_hash(password)
+
+
+def verify_password(stored_hash, password):
+    """校验密码，兼容argon2与Werkzeug（pbkdf2/scrypt）两种哈希格式"""
+    if stored_hash.startswith('$argon2'):
+        if _password_hasher is None:
+            return False
+        try:
+            return _password_hasher.verify(stored_hash, password)
+        except (VerificationError, InvalidHashError):
+            return False
+    return check_password_hash(stored_hash, password)
+
+
+def password_needs_rehash(stored_hash):
+    """判断已存哈希是否需要升级为当前的argon2参数"""
+    if _password_hasher is None:
+        return False
+    if not stored_hash.startswith('$argon2'):
+        return True
+    return _password_hasher.check_needs_rehash(stored_hash)
+
+
 # 用户数据存储（实际生产环境应使用数据库）
-users_db = {
-    'admin': {
-        'username': 'admin',
-        'password': generate_password_hash('admin123'),
-        'email': 'admin@aifi.com',
-        'fullname': '系统管理员',
-        'role': 'admin',
-        'status': 'active',
-        'created_at': '2024-01-01 00:00:00'
-    },
-    'user': {
-        'username': 'user',
-        'password': generate_password_hash('user123'),
-        'email': 'user@aifi.com',
-        'fullname': '普通用户',
-        'role': 'user',
-        'status': 'active',
-        'created_at': '2024-01-01 00:00:00'
-    },
-    'analyst': {
-        'username': 'analyst',
-        'password': generate_password_hash('analyst123'),
-        'email': 'analyst@aifi.com',
-        'fullname': '财务分析师',
-        'role': 'user',
-        'status': 'active',
-        'created_at': '2024-01-01 00:00:00'
-    }
-}
+# 默认用户只在没有用户数据文件时才生成，避免每次启动都计算随后被文件内容覆盖的密码哈希
+users_db = {}
+
+
+def _seed_default_users():
+    """写入默认用户"""
+    users_db.update({
+        'admin': {
+            'username': 'admin',
+            'password': hash_password('admin123'),
+            'email': 'admin@aifi.com',
+            'fullname': '系统管理员',
+            'role': 'admin',
+            'status': 'active',
+            'created_at': '2024-01-01 00:00:00'
+        },
+        'user': {
+            'username': 'user',
+            'password': hash_password('user123'),
+            'email': 'user@aifi.com',
+            'fullname': '普通用户',
+            'role': 'user',
+            'status': 'active',
+            'created_at': '2024-01-01 00:00:00'
+        },
+        'analyst': {
+            'username': 'analyst',
+            'password': hash_password('analyst123'),
+            'email': 'analyst@aifi.com',
+            'fullname': '财务分析师',
+            'role': 'user',
+            'status': 'active',
+            'created_at': '2024-01-01 00:00:00'
+        }
+    })
+
+# 邮箱到用户名的索引，用于O(1)检查邮箱是否已被注册
+_email_to_username = {}
+
+# 活跃用户数，随用户增删/状态变化增量维护，避免每次统计都遍历users_db
+_active_user_count = 0
+
+# 保护用户数据"检查后写入"操作的锁
+_users_lock = threading.Lock()
+
+
+def rebuild_email_index():
+    """根据users_db重建邮箱索引及活跃用户计数"""
+    global _active_user_count
+    _email_to_username.clear()
+    _active_user_count = 0
+    for username, user in users_db.items():
+        index_user(username, user)
+
+
+def index_user(username, user):
+    """将用户加入邮箱索引及活跃用户计数（新增用户时与写入users_db一起调用，需持有_users_lock）"""
+    global _active_user_count
+    if user.get('email'):
+        _email_to_username[user['email']] = username
+    if user.get('status') == 'active':
+        _active_user_count += 1
+
 
 # 加载用户数据
 def load_users():
@@ -135,27 +489,110 @@ def load_users():
     global users_db
     if os.path.exists(USERS_STORAGE_FILE):
         try:
-            with open(USERS_STORAGE_FILE, 'r', encoding='utf-8') as f:
-                users_db = json.load(f)
+            with open(USERS_STORAGE_FILE, 'rb') as f:
+                users_db = orjson.loads(f.read())
             print(f"✓ 已加载 {len(users_db)} 个用户")
         except Exception as e:
             print(f"✗ 加载用户数据失败: {str(e)}")
+            # 文件损坏时使用默认用户，但不覆盖原文件
+            _seed_default_users()
     else:
-        # 如果文件不存在，保存默认用户
+        # 如果文件不存在，生成并保存默认用户
+        _seed_default_users()
         save_users()
+    rebuild_email_index()
 
 # 保存用户数据
 def save_users():
     """保存用户数据到文件"""
     try:
-        with open(USERS_STORAGE_FILE, 'w', encoding='utf-8') as f:
-            json.dump(users_db, f, ensure_ascii=False, indent=2)
+        write_file_atomic(USERS_STORAGE_FILE, orjson.dumps(users_db, default=json_default, option=ORJSON_OPTIONS))
         return True
     except Exception as e:
         print(f"✗ 保存用户数据失败: {str(e)}")
         return False
 
 
+
+# ========== 后台批量持久化 ==========
+# 请求线程只标记待保存的数据，由后台线程合并短时间内的多次修改后统一写盘
+
+SAVE_DELAY = 0.5  # 合并写入的等待窗口（秒）
+SAVE_RETRY_MAX_DELAY = 60  # 写入失败后重试间隔的上限（秒）
+
+_pending_saves = set()
+_persist_cond = threading.Condition()
+_write_lock = threading.Lock()
+_persist_thread = None
+
+
+def _get_savers():
+    """待保存数据名称到保存函数的映射"""
+    return {
+        'reports': save_reports,
+        'users': save_users,
+        'download_records': save_download_records,
+        'operation_logs': save_operation_logs,
+    }
+
+
+def flush_pending_saves():
+    """立即写出所有待保存的数据，返回写入失败的数据名称"""
+    with _persist_cond:
+        names = set(_pending_saves)
+        _pending_saves.clear()
+    if not names:
+        return set()
+    savers = _get_savers()
+    with _write_lock:
+        return {name for name in names if not savers[name]()}
+
+
+def _persist_worker():
+    """后台写入线程：等待修改标记，延迟一个窗口后批量写入"""
+    delay = SAVE_DELAY
+    while True:
+        with _persist_cond:
+            while not _pending_saves:
+                _persist_cond.wait()
+        time.sleep(delay)
+        failed = flush_pending_saves()
+        if failed:
+            # 写入失败（如磁盘错误）时重新排队并按指数退避重试，之后没有新的修改也会继续写入
+            with _persist_cond:
+                _pending_saves.update(failed)
+            delay = min(delay * 2, SAVE_RETRY_MAX_DELAY)
+        else:
+            delay = SAVE_DELAY
+
+
+def schedule_save(*names):
+    """
+    标记数据需要持久化，由后台线程批量写入
+
+    Args:
+        names: 数据名称，见_get_savers
+    """
+    global _persist_thread
+    with _persist_cond:
+        if _persist_thread is None:
+            _persist_thread = threading.Thread(target=_persist_worker, name='aifi-persist', daemon=True)
+            _persist_thread.start()
+        _pending_saves.update(names)
+        _persist_cond.notify()
+
+
+# 进程退出时写出尚未落盘的数据
+atexit.register(flush_pending_saves)
+
+
+def log_operation(entry):
+    """记录操作日志：保存到内存中的最近记录，并由后台线程追加写入日志文件"""
+    operation_logs.append(entry)
+    _unsaved_logs.append(entry)
+    schedule_save('operation_logs')
+
+
 # 登录装饰器
 def login_required(f):
     """要求用户登录的装饰器"""
@@ -180,10 +617,67 @@ def admin_required(f):
     return decorated_function
 
 
-def allowed_file(filename):
-    """检查文件扩展名是否允许"""
-    return '.' in filename and \
-           filename.rsplit('.', 1)[1].lower() in Config.ALLOWED_EXTENSIONS
+def upload_extension(filename):
+    """返回允许上传的小写扩展名，不允许时返回None（校验与取扩展名只需扫描一次文件名）"""
+    head, dot, ext = filename.rpartition('.')
+    ext = ext.lower()
+    return ext if dot and ext in Config.ALLOWED_EXTENSIONS else None
+
+
+
+# 每种格式缓存最近一次格式化结果：{格式: (秒级时间戳, 时间字符串)}，同一秒内的调用直接复用
+_now_str_cache = {}
+
+
+def now_str(fmt='%Y-%m-%d %H:%M:%S'):
+    """当前时间字符串（同一请求内只调用一次，多处记录共用；time.strftime无需构造datetime对象）"""
+    second = int(time.time())
+    cached = _now_str_cache.get(fmt)
+    if cached is not None and cached[0] == second:
+        return cached[1]
+    value = time.strftime(fmt, time.localtime(second))
+    _now_str_cache[fmt] = (second, value)
+    return value
+
+
+# 密码校验结果缓存：{(密码哈希, HMAC(明文)): (校验结果, 时间戳)}
+# 明文摘要使用进程内随机密钥的HMAC，进程内存泄露时也无法用缓存键离线猜测密码
+PASSWORD_CACHE_TTL = 60  # 秒
+PASSWORD_CACHE_MAX = 256  # 最多缓存的条目数
+
+_verify_cache = {}
+_verify_cache_lock = threading.Lock()
+_verify_cache_secret = secrets.token_bytes(32)
+
+
+def cached_check_password(stored_hash, password):
+    """
+    带短期缓存的密码校验，TTL内重复校验同一密码时跳过高成本的KDF计算
+
+    成功与失败的结果都会缓存，避免反复提交错误密码消耗CPU。
+    缓存键包含密码哈希本身，修改密码后旧条目自然失效。
+    """
+    digest = hmac.new(_verify_cache_secret, (password or '').encode('utf-8'), hashlib.sha256).digest()
+    key = (stored_hash, digest)
+    now = time.monotonic()
+    
+    with _verify_cache_lock:
+        cached = _verify_cache.get(key)
+    if cached is not None and now - cached[1] < PASSWORD_CACHE_TTL:
+        return cached[0]
+    
+    result = verify_password(stored_hash, password or '')
+    
+    with _verify_cache_lock:
+        # 顺带清理过期条目
+        expired = [k for k, (_, ts) in _verify_cache.items() if now - ts >= PASSWORD_CACHE_TTL]
+        for k in expired:
+            del _verify_cache[k]
+        # 超出上限时淘汰最早写入的条目
+        while len(_verify_cache) >= PASSWORD_CACHE_MAX:
+            del _verify_cache[next(iter(_verify_cache))]
+        _verify_cache[key] = (result, now)
+    return result
 
 
 # ========== 认证相关路由 ==========
@@ -203,19 +697,34 @@ def login():
             if user.get('status') == 'inactive':
                 return render_template('login.html', error='账号已被禁用，请联系管理员')
             
-            if check_password_hash(user['password'], password):
+            if cached_check_password(user['password'], password):
                 # 登录成功
-                session['username'] = username
-                session['fullname'] = user['fullname']
-                session['role'] = user['role']
-                session['email'] = user['email']
+                session.update({
+                    'username': username,
+                    'fullname': user['fullname'],
+                    'role': user['role'],
+                    'email': user['email']
+                })
+                
+                # 旧格式哈希在登录成功后升级为argon2
+                old_hash = user['password']
+                if password_needs_rehash(old_hash):
+                    # 在锁外计算慢哈希，避免登录请求在_users_lock上排队；
+                    # 期间密码被修改过则放弃升级，不覆盖新密码
+                    new_hash = hash_password(password)
+                    with _users_lock:
+                        rehashed = user['password'] == old_hash
+                        if rehashed:
+                            user['password'] = new_hash
+                    if rehashed:
+                        schedule_save('users')
                 
                 # 记录登录日志
-                operation_logs.append({
+                log_operation({
                     'type': '用户登录',
                     'username': username,
                     'fullname': user['fullname'],
-                    'time': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+                    'time': now_str()
                 })
                 
                 return redirect(url_for('index'))
@@ -251,35 +760,45 @@ def register():
         if len(password) < 6:
             return render_template('register.html', error='密码长度至少为6位')
         
+        # 先做无锁的快速查重，避免为注定失败的注册计算开销较大的密码哈希
         if username in users_db:
             return render_template('register.html', error='用户名已存在')
+        if email in _email_to_username:
+            return render_template('register.html', error='该邮箱已被注册')
         
-        # 检查邮箱是否已被使用
-        for user in users_db.values():
-            if user['email'] == email:
-                return render_template('register.html', error='该邮箱已被注册')
+        password_hash = hash_password(password)
+        created_at = now_str()
         
-        # 创建新用户
-        users_db[username] = {
-            'username': username,
-            'password': generate_password_hash(password),
-            'email': email,
-            'fullname': fullname,
-            'role': 'user',  # 默认角色为普通用户
-            'status': 'active',
-            'ai_model': 'gpt-4-turbo',  # 默认AI模型
-            'created_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        }
+        with _users_lock:
+            if username in users_db:
+                return render_template('register.html', error='用户名已存在')
+            
+            # 加锁后再次检查，防止并发注册
+            if email in _email_to_username:
+                return render_template('register.html', error='该邮箱已被注册')
+            
+            # 创建新用户
+            users_db[username] = user = {
+                'username': username,
+                'password': password_hash,
+                'email': email,
+                'fullname': fullname,
+                'role': 'user',  # 默认角色为普通用户
+                'status': 'active',
+                'ai_model': 'gpt-4-turbo',  # 默认AI模型
+                'created_at': created_at
+            }
+            index_user(username, user)
         
-        # 保存用户数据
-        save_users()
+        # 保存用户数据（后台批量写入）
+        schedule_save('users')
         
         # 记录注册日志
-        operation_logs.append({
+        log_operation({
             'type': '用户注册',
             'username': username,
             'fullname': fullname,
-            'time': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+            'time': created_at
         })
         
         # 注册成功，跳转到登录页
@@ -298,10 +817,10 @@ def logout():
     username = session.get('username', '未知用户')
     
     # 记录登出日志
-    operation_logs.append({
+    log_operation({
         'type': '用户登出',
         'username': username,
-        'time': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        'time': now_str()
     })
     
     # 清除session
@@ -326,24 +845,10 @@ def landing():
 @login_required
 def index():
     """仪表板首页"""
-    # 统计已生成的报告数量
-    reports_count = 0
-    companies_count = 0
-    
-    try:
-        if os.path.exists(REPORTS_STORAGE_FILE):
-            with open(REPORTS_STORAGE_FILE, 'r', encoding='utf-8') as f:
-                reports_data = json.load(f)
-                reports_count = len(reports_data)
-                # 统计不同企业数量
-                companies = set()
-                for report in reports_data.values():
-                    company_name = report.get('basic_info', {}).get('企业名称', '')
-                    if company_name:
-                        companies.add(company_name)
-                companies_count = len(companies)
-    except Exception as e:
-        print(f"读取报告统计失败: {str(e)}")
+    # 统计已生成的报告数量（直接使用内存中的报告数据和企业索引，无需遍历全部报告）
+    reports_count = len(report_storage)
+    # 统计不同企业数量
+    companies_count = len(_company_report_counts)
     
     return render_template('index.html', 
                          user=session,
@@ -351,10 +856,189 @@ def index():
                          companies_count=companies_count)
 
 
+# ========== 生成器实例复用 ==========
+
+# 导出器不保存单次导出的状态，进程内共享一个实例
+_export_generator = ExportGenerator()
+
+# ReportGenerator不保存单次生成的状态，按AI模型在各线程间共享：{AI模型: ReportGenerator}
+_report_generators = {}
+_report_generators_lock = threading.Lock()
+
+
+@lru_cache(maxsize=1)
+def get_pdf_exporter():
+    """获取共享的PDF导出器（首次使用时才导入WeasyPrint）"""
+    from modules.pdf_export import PDFExporter
+    return PDFExporter()
+
+
+@lru_cache(maxsize=1)
+def get_chat_analyzer():
+    """获取AI对话共享的分析器（不保存单次对话状态，OpenAI客户端可跨线程复用连接池）"""
+    return AIAnalyzer()
+
+
+def get_report_generator(ai_model=None):
+    """获取指定AI模型的共享报告生成器"""
+    generator = _report_generators.get(ai_model)
+    if generator is None:
+        with _report_generators_lock:
+            generator = _report_generators.get(ai_model)
+            if generator is None:
+                generator = _report_generators[ai_model] = ReportGenerator(ai_model=ai_model)
+    return generator
+
+
+# 后台报告生成：上传请求只负责落盘，报告在线程池中生成，前端轮询状态
+_report_executor = ThreadPoolExecutor(max_workers=os.cpu_count(), thread_name_prefix='aifi-report')
+
+# 生成中或失败的任务状态：{报告ID: {'status': ..., 'username': ..., 'error': ..., 'created': ...}}
+report_jobs = {}
+
+REPORT_ERROR_TTL = 3600  # 无人查询的失败状态保留时间（秒）
+
+
+def _prune_failed_report_jobs():
+    """清理长时间无人查询的失败任务状态（生成中的任务不清理）"""
+    now = time.monotonic()
+    for report_id, job in list(report_jobs.items()):
+        if job['status'] == 'error' and now - job['created'] > REPORT_ERROR_TTL:
+            report_jobs.pop(report_id, None)
+
+
+def _generate_report_job(report_id, filepath, filename, username, fullname, ai_model, file_hash=None):
+    """
+    后台生成报告任务
+    
+    Args:
+        report_id: 报告ID
+        filepath: 已保存的上传文件路径
+        filename: 用户上传时的原始文件名
+        username: 创建者用户名
+        fullname: 创建者姓名
+        ai_model: 使用的AI模型
+        file_hash: 上传文件内容哈希，用于重复上传去重
+    """
+    try:
+        generator = get_report_generator(ai_model)
+        report_data = generator.generate_report(filepath)
+        
+        if 'error' in report_data:
+            report_jobs[report_id] = {'status': 'error', 'username': username, 'error': report_data['error'],
+                                      'created': time.monotonic()}
+            return
+        
+        # 存储报告数据（添加用户信息和元数据）
+        report_data['report_id'] = report_id
+        report_data['created_by'] = username
+        report_data['created_by_name'] = fullname
+        report_data['filename'] = filename
+        if file_hash:
+            report_data['file_hash'] = file_hash
+        normalize_report_data(report_data)
+        report_storage[report_id] = report_data
+        index_report(report_id, report_data)
+        
+        # 持久化保存（后台批量写入）
+        mark_report_saved(report_id)
+        
+        # 记录操作
+        log_operation({
+            'type': '报告生成',
+            'report_id': report_id,
+            'company': report_data['basic_info'].get('企业名称', '未知'),
+            'username': username,
+            'fullname': fullname,
+            # 报告刚组装完成，直接复用其生成时间
+            'time': report_data.get('generated_at') or now_str()
+        })
+        
+        # 报告已入库，状态可直接从report_storage判断
+        report_jobs.pop(report_id, None)
+        
+    except Exception as e:
+        logger.exception('✗ 报告生成失败 %s', report_id)
+        report_jobs[report_id] = {'status': 'error', 'username': username, 'error': f'处理失败: {str(e)}',
+                                  'created': time.monotonic()}
+
+
+UPLOAD_CHUNK_SIZE = 1 << 20
+
+
+def save_upload_stream(stream, filepath):
+    """
+    将上传流分块写入磁盘，同时计算内容哈希
+    
+    复用同一块缓冲区读取（readinto），避免每个分块都分配新的bytes对象。
+    
+    Returns:
+        str: 文件内容的blake2b哈希
+    """
+    h = hashlib.blake2b(digest_size=16)
+    with open(filepath, 'wb', buffering=0) as dst:
+        if hasattr(stream, 'readinto'):
+            buf = bytearray(UPLOAD_CHUNK_SIZE)
+            view = memoryview(buf)
+            while n := stream.readinto(buf):
+                h.update(view[:n])
+                dst.write(view[:n])
+        else:
+            while chunk := stream.read(UPLOAD_CHUNK_SIZE):
+                h.update(chunk)
+                dst.write(chunk)
+    return h.hexdigest()
+
+
+def handle_upload(stream, original_filename, ext):
+    """保存上传的文件流并提交后台报告生成，返回JSON响应"""
+    try:
+        # 保存文件（按1MB分块直接写入磁盘，同时计算内容哈希）
+        # 时间戳加随机后缀，同一秒内的并发上传不会互相覆盖
+        report_id = f"{now_str('%Y%m%d%H%M%S')}_{secrets.token_hex(3)}"
+        # 磁盘文件名只用报告ID和（已校验的）扩展名，原始文件名单独保存在报告数据中用于展示
+        filepath = os.path.join(Config.UPLOAD_FOLDER, f"{report_id}.{ext}")
+        file_hash = save_upload_stream(stream, filepath)
+        
+        username = session.get('username')
+        
+        # 同一用户重复上传相同文件时直接返回已有报告
+        existing_id = _hash_to_report.get((username, file_hash))
+        if existing_id in report_storage:
+            os.remove(filepath)
+            return jsonify({
+                'success': True,
+                'report_id': existing_id,
+                'status': 'done',
+                'message': '该文件已生成过报告'
+            })
+        
+        # 获取用户的AI模型设置
+        user_ai_model = users_db.get(username, {}).get('ai_model', None)
+        
+        # 提交后台生成报告，立即返回
+        _prune_failed_report_jobs()
+        report_jobs[report_id] = {'status': 'processing', 'username': username}
+        _report_executor.submit(
+            _generate_report_job, report_id, filepath, original_filename,
+            username, session.get('fullname'), user_ai_model, file_hash
+        )
+        
+        return jsonify({
+            'success': True,
+            'report_id': report_id,
+            'status': 'processing',
+            'message': '报告生成中'
+        })
+        
+    except Exception as e:
+        return jsonify({'success': False, 'error': f'处理失败: {str(e)}'})
+
+
 @app.route('/upload', methods=['POST'])
 @login_required
 def upload_file():
-    """处理文件上传"""
+    """处理文件上传（multipart表单）"""
     if 'file' not in request.files:
         return jsonify({'success': False, 'error': '没有文件上传'})
     
@@ -363,65 +1047,64 @@ def upload_file():
     if file.filename == '':
         return jsonify({'success': False, 'error': '没有选择文件'})
     
-    if file and allowed_file(file.filename):
-        try:
-            # 保存文件
-            filename = secure_filename(file.filename)
-            timestamp = datetime.now().strftime('%Y%m%d%H%M%S')
-            filename = f"{timestamp}_{filename}"
-            filepath = os.path.join(Config.UPLOAD_FOLDER, filename)
-            file.save(filepath)
-            
-            # 生成报告ID
-            report_id = timestamp
-            
-            # 获取用户的AI模型设置
-            username = session.get('username')
-            user_ai_model = users_db.get(username, {}).get('ai_model', None)
-            
-            # 生成报告
-            generator = ReportGenerator(ai_model=user_ai_model)
-            report_data = generator.generate_report(filepath)
-            
-            if 'error' in report_data:
-                return jsonify({'success': False, 'error': report_data['error']})
-            
-            # 存储报告数据（添加用户信息和元数据）
-            report_data['report_id'] = report_id
-            report_data['created_by'] = session.get('username')
-            report_data['created_by_name'] = session.get('fullname')
-            report_data['filename'] = file.filename
-            report_storage[report_id] = report_data
-            
-            # 持久化保存
-            save_reports()
-            
-            # 记录操作
-            operation_logs.append({
-                'type': '报告生成',
-                'report_id': report_id,
-                'company': report_data['basic_info'].get('企业名称', '未知'),
-                'username': session.get('username'),
-                'fullname': session.get('fullname'),
-                'time': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-            })
-            
-            return jsonify({
-                'success': True,
-                'report_id': report_id,
-                'message': '报告生成成功'
-            })
-            
-        except Exception as e:
-            return jsonify({'success': False, 'error': f'处理失败: {str(e)}'})
+    ext = upload_extension(file.filename)
+    if file and ext:
+        return handle_upload(file.stream, file.filename, ext)
     
     return jsonify({'success': False, 'error': '不支持的文件格式'})
 
 
+@app.route('/upload_stream', methods=['POST'])
+@login_required
+def upload_file_stream():
+    """
+    处理文件上传（请求体即文件内容）
+    
+    不经过multipart解析，请求体直接分块写入目标文件，不会先缓冲到内存或临时文件。
+    原始文件名通过URL编码的 X-Filename 请求头传递。
+    """
+    filename = unquote(request.headers.get('X-Filename', ''))
+    if not filename:
+        return jsonify({'success': False, 'error': '没有选择文件'})
+    
+    ext = upload_extension(filename)
+    if not ext:
+        return jsonify({'success': False, 'error': '不支持的文件格式'})
+    
+    if request.content_length is None:
+        return jsonify({'success': False, 'error': '缺少Content-Length'})
+    
+    # request.stream 按 Content-Length 与 MAX_CONTENT_LENGTH 限制读取长度
+    return handle_upload(request.stream, filename, ext)
+
+
+@app.route('/api/report_status/<report_id>')
+@login_required
+def get_report_status(report_id):
+    """查询报告生成状态"""
+    username = session.get('username')
+    role = session.get('role')
+    
+    job = report_jobs.get(report_id)
+    if job is not None:
+        if role != 'admin' and job.get('username') != username:
+            return jsonify({'success': False, 'error': '无权访问此报告'})
+        if job['status'] == 'error':
+            # 失败结果只返回一次
+            report_jobs.pop(report_id, None)
+            return jsonify({'success': False, 'status': 'error', 'error': job['error']})
+        return jsonify({'success': True, 'status': job['status']})
+    
+    if report_id in report_storage:
+        return jsonify({'success': True, 'status': 'done'})
+    
+    return jsonify({'success': False, 'error': '报告不存在'})
+
+
 def normalize_report_data(report_data):
     """
     规范化报告数据，确保兼容性
-    修复旧报告的数据格式问题
+    修复旧报告的数据格式问题（在报告加载和入库时调用一次，原地修改）
     """
     # 确保years是列表
     if 'years' in report_data and report_data['years']:
@@ -453,16 +1136,16 @@ def normalize_report_data(report_data):
 @login_required
 def view_report(report_id):
     """查看报告"""
+    username = session.get('username')
+    role = session.get('role')
+    
     if report_id not in report_storage:
         return "报告不存在", 404
     
     report_data = report_storage[report_id]
     
-    # 规范化报告数据，确保兼容性
-    report_data = normalize_report_data(report_data)
-    
     # 检查权限：管理员可以查看所有报告，普通用户只能查看自己的报告
-    if session.get('role') != 'admin' and report_data.get('created_by') != session.get('username'):
+    if role != 'admin' and report_data.get('created_by') != username:
         return "无权访问此报告", 403
     
     return render_template('report.html', report_id=report_id, report=report_data, user=session)
@@ -472,119 +1155,401 @@ def view_report(report_id):
 @login_required
 def get_report_data(report_id):
     """获取报告数据API"""
-    if report_id not in report_storage:
-        return jsonify({'success': False, 'error': '报告不存在'})
+    username = session.get('username')
+    role = session.get('role')
     
-    report_data = report_storage[report_id]
+    report_data = report_storage.get(report_id)
+    if report_data is None:
+        return jsonify({'success': False, 'error': '报告不存在'})
     
     # 检查权限
-    if session.get('role') != 'admin' and report_data.get('created_by') != session.get('username'):
+    if role != 'admin' and report_data.get('created_by') != username:
         return jsonify({'success': False, 'error': '无权访问此报告'})
     
-    return jsonify({
-        'success': True,
-        'data': report_storage[report_id]
+    return app.response_class(get_report_json(report_id, report_data), mimetype='application/json')
+
+
+# 报告数据接口的响应体缓存：{报告ID: JSON字节}，报告入库后不再修改，只需序列化一次
+REPORT_JSON_CACHE_SIZE = 64
+_report_json_cache = OrderedDict()
+_report_json_cache_lock = threading.Lock()
+
+
+def get_report_json(report_id, report_data):
+    """获取报告数据接口的JSON响应体（LRU缓存）"""
+    with _report_json_cache_lock:
+        body = _report_json_cache.get(report_id)
+        if body is not None:
+            _report_json_cache.move_to_end(report_id)
+            return body
+    
+    body = orjson.dumps({'success': True, 'data': report_data},
+                        default=json_default, option=ORJSON_OPTIONS)
+    with _report_json_cache_lock:
+        _report_json_cache[report_id] = body
+        while len(_report_json_cache) > REPORT_JSON_CACHE_SIZE:
+            _report_json_cache.popitem(last=False)
+    return body
+
+
+# ========== 导出文件缓存 ==========
+# 导出文件按 报告ID/格式_内容摘要 缓存在磁盘上，报告内容不变时重复下载无需重新生成
+
+_EXPORT_EXTENSIONS = {'word': 'docx', 'pdf': 'pdf', 'pdf_html': 'pdf'}
+
+
+def report_digest(report_data):
+    """计算报告内容摘要"""
+    payload = orjson.dumps(
+        report_data,
+        default=json_default,
+        option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS | orjson.OPT_SORT_KEYS
+    )
+    return hashlib.blake2b(payload, digest_size=16).hexdigest()
+
+
+def get_export_cache_path(report_id, format, report_data):
+    """获取导出文件的缓存路径"""
+    report_dir = os.path.join(Config.EXPORT_CACHE_FOLDER, report_id)
+    os.makedirs(report_dir, exist_ok=True)
+    filename = f"{format}_{report_digest(report_data)}.{_EXPORT_EXTENSIONS[format]}"
+    return os.path.join(report_dir, filename)
+
+
+def evict_export_cache():
+    """缓存总大小超过上限时，按最近使用时间淘汰最旧的导出文件"""
+    limit = Config.EXPORT_CACHE_MAX_MB * 1024 * 1024
+    entries = []
+    total = 0
+    
+    with os.scandir(Config.EXPORT_CACHE_FOLDER) as report_dirs:
+        for report_dir in report_dirs:
+            if not report_dir.is_dir():
+                continue
+            with os.scandir(report_dir.path) as files:
+                for entry in files:
+                    # 跳过正在写入的临时文件
+                    if entry.is_file() and not entry.name.startswith('.'):
+                        stat = entry.stat()
+                        entries.append((stat.st_mtime, stat.st_size, entry.path))
+                        total += stat.st_size
+    
+    if total <= limit:
+        return
+    
+    entries.sort()
+    for _, size, path in entries:
+        if total <= limit:
+            break
+        try:
+            os.remove(path)
+            total -= size
+        except OSError as e:
+            print(f"清理导出缓存失败: {path}, 错误: {str(e)}")
+
+
+def clear_export_cache(report_id):
+    """删除指定报告的全部导出缓存"""
+    shutil.rmtree(os.path.join(Config.EXPORT_CACHE_FOLDER, report_id), ignore_errors=True)
+
+
+EXPORT_FORMATS = ('word', 'pdf', 'pdf_html')
+
+
+def build_export(report_id, format, report_data):
+    """
+    生成导出文件，报告内容未变化时直接复用缓存
+    
+    Args:
+        report_id: 报告ID
+        format: 导出格式（word/pdf/pdf_html）
+        report_data: 规范化后的报告数据
+        
+    Returns:
+        Tuple[Optional[str], str]: (导出文件路径，失败时为None, 下载文件名)
+    """
+    company_name = report_data['basic_info'].get('企业名称', '企业')
+    
+    # 生成文件名
+    if format == 'pdf_html':
+        filename = get_pdf_exporter().get_pdf_filename(report_data, report_id)
+    else:
+        ext = 'docx' if format == 'word' else 'pdf'
+        filename = f"{company_name}_财务分析报告_{report_id}.{ext}"
+    
+    # 报告内容未变化时直接复用缓存的导出文件
+    filepath = get_export_cache_path(report_id, format, report_data)
+    if os.path.exists(filepath) and os.path.getsize(filepath) > 0:
+        os.utime(filepath)  # 刷新修改时间，用于LRU淘汰
+        return filepath, filename
+    
+    # 先写入临时文件，成功后再原子替换，避免并发导出时读到半成品
+    tmp_path = os.path.join(
+        os.path.dirname(filepath),
+        f".{threading.get_ident()}_{os.path.basename(filepath)}"
+    )
+    
+    if format == 'word':
+        # 导出Word
+        success = _export_generator.export_to_word(report_data, tmp_path)
+        
+    elif format == 'pdf_html':
+        # 新方案：基于HTML的PDF导出
+        success = get_pdf_exporter().export_to_pdf(report_data, tmp_path)
+        
+    else:  # PDF（旧方案，使用ReportLab）
+        success = _export_generator.export_to_pdf(report_data, tmp_path)
+    
+    if not success:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        return None, filename
+    
+    os.replace(tmp_path, filepath)
+    evict_export_cache()
+    return filepath, filename
+
+
+def record_export(report_id, format, report_data, filename, filepath, username, fullname):
+    """记录导出操作日志和下载记录"""
+    company_name = report_data['basic_info'].get('企业名称', '企业')
+    log_time = now_str()
+    
+    # 记录操作日志
+    log_operation({
+        'type': f'报告导出({format.upper()})',
+        'report_id': report_id,
+        'company': company_name,
+        'username': username,
+        'fullname': fullname,
+        'time': log_time
     })
+    
+    # 记录下载记录
+    record = {
+        'report_id': report_id,
+        'company_name': company_name,
+        'format': format.upper(),
+        'filename': filename,
+        'username': username,
+        'fullname': fullname,
+        'download_time': log_time,
+        'file_size': os.path.getsize(filepath) if os.path.exists(filepath) else 0
+    }
+    download_records.append(record)
+    downloads_by_user.setdefault(username, []).append(record)
+    
+    # 保存下载记录到文件（后台批量写入）
+    schedule_save('download_records')
+
+
+def send_export_file(filepath, filename):
+    """发送导出文件"""
+    if Config.X_ACCEL_REDIRECT_PREFIX:
+        # 由nginx根据X-Accel-Redirect直接发送文件，工作线程只需返回响应头
+        rel_path = os.path.relpath(filepath, Config.EXPORT_FOLDER).replace(os.sep, '/')
+        response = app.response_class()
+        response.headers['X-Accel-Redirect'] = Config.X_ACCEL_REDIRECT_PREFIX.rstrip('/') + '/' + quote(rel_path)
+        response.headers['Content-Disposition'] = f"attachment; filename*=UTF-8''{quote(filename)}"
+        response.headers['Content-Type'] = 'application/octet-stream'
+        return response
+    # 配置USE_X_SENDFILE时send_file只返回X-Sendfile头，由Apache发送文件；
+    # 按路径发送时Werkzeug会设置Content-Length，并交给服务器的
+    # wsgi.file_wrapper（gunicorn等会使用sendfile零拷贝）；支持条件请求与断点续传
+    return send_file(
+        filepath,
+        as_attachment=True,
+        download_name=filename,
+        conditional=True,
+        etag=True,
+        max_age=0
+    )
 
 
 @app.route('/export/<report_id>/<format>')
 @login_required
 def export_report(report_id, format):
-    """导出报告"""
+    """导出报告（同步生成并下载）"""
+    username = session.get('username')
+    role = session.get('role')
+    
     if report_id not in report_storage:
         return "报告不存在", 404
     
     report_data = report_storage[report_id]
     
-    # 规范化报告数据，确保兼容性
-    report_data = normalize_report_data(report_data)
-    
     # 检查权限
-    if session.get('role') != 'admin' and report_data.get('created_by') != session.get('username'):
+    if role != 'admin' and report_data.get('created_by') != username:
         return "无权导出此报告", 403
     
-    if format not in ['word', 'pdf', 'pdf_html']:
+    if format not in EXPORT_FORMATS:
         return "不支持的导出格式", 400
     
     try:
-        company_name = report_data['basic_info'].get('企业名称', '企业')
-        
-        # 生成文件名
-        if format == 'word':
-            filename = f"{company_name}_财务分析报告_{report_id}.docx"
-            filepath = os.path.join(Config.EXPORT_FOLDER, filename)
-            
-            # 导出Word
-            exporter = ExportGenerator()
-            success = exporter.export_to_word(report_data, filepath)
-            
-        elif format == 'pdf_html':
-            # 新方案：基于HTML的PDF导出
-            from modules.pdf_export import PDFExporter
-            
-            pdf_exporter = PDFExporter()
-            filename = pdf_exporter.get_pdf_filename(report_data, report_id)
-            filepath = os.path.join(Config.EXPORT_FOLDER, filename)
-            
-            # 导出PDF
-            success = pdf_exporter.export_to_pdf(report_data, filepath)
-            
-        else:  # PDF（旧方案，使用ReportLab）
-            filename = f"{company_name}_财务分析报告_{report_id}.pdf"
-            filepath = os.path.join(Config.EXPORT_FOLDER, filename)
-            
-            # 导出PDF
-            exporter = ExportGenerator()
-            success = exporter.export_to_pdf(report_data, filepath)
+        filepath, filename = build_export(report_id, format, report_data)
         
-        if not success:
+        if filepath is None:
             return "导出失败", 500
         
-        # 记录操作日志
-        operation_logs.append({
-            'type': f'报告导出({format.upper()})',
-            'report_id': report_id,
-            'company': company_name,
-            'username': session.get('username'),
-            'fullname': session.get('fullname'),
-            'time': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        })
-        
-        # 记录下载记录
-        download_records.append({
-            'report_id': report_id,
-            'company_name': company_name,
-            'format': format.upper(),
-            'filename': filename,
-            'username': session.get('username'),
-            'fullname': session.get('fullname'),
-            'download_time': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-            'file_size': os.path.getsize(filepath) if os.path.exists(filepath) else 0
-        })
-        
-        # 保存下载记录到文件
-        save_download_records()
+        record_export(report_id, format, report_data, filename, filepath,
+                      username, session.get('fullname'))
         
-        # 发送文件
-        return send_file(
-            filepath,
-            as_attachment=True,
-            download_name=filename
-        )
+        return send_export_file(filepath, filename)
         
     except Exception as e:
-        import traceback
-        traceback.print_exc()
+        logger.exception('导出报告失败 %s', report_id)
         return f"导出失败: {str(e)}", 500
 
 
+# ========== 后台导出任务 ==========
+# 导出在线程池中执行，请求立即返回任务ID，前端轮询状态后再下载
+
+EXPORT_JOB_TTL = 3600  # 未下载的导出任务保留时间（秒）
+
+_export_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix='aifi-export')
+
+# 导出任务：{任务ID: {'future': Future, 'report_id': ..., 'format': ..., 'username': ..., 'created': ...}}
+export_jobs = {}
+
+
+def _run_export_job(report_id, format, report_data):
+    """后台执行导出（PDF导出需要渲染模板，因此在应用上下文中运行）"""
+    with app.app_context():
+        return build_export(report_id, format, report_data)
+
+
+def _prune_jobs(jobs, ttl):
+    """清理超时未取走结果的后台任务"""
+    now = time.monotonic()
+    for job_id, job in list(jobs.items()):
+        if now - job['created'] > ttl:
+            jobs.pop(job_id, None)
+
+
+def _get_export_job(job_id, username, role):
+    """获取当前用户有权访问的导出任务"""
+    job = export_jobs.get(job_id)
+    if job is None:
+        return None
+    if role != 'admin' and job['username'] != username:
+        return None
+    return job
+
+
+@app.route('/api/export/<report_id>/<format>', methods=['POST'])
+@login_required
+def start_export(report_id, format):
+    """提交后台导出任务"""
+    username = session.get('username')
+    role = session.get('role')
+    
+    if report_id not in report_storage:
+        return jsonify({'success': False, 'error': '报告不存在'})
+    
+    report_data = report_storage[report_id]
+    
+    # 检查权限
+    if role != 'admin' and report_data.get('created_by') != username:
+        return jsonify({'success': False, 'error': '无权导出此报告'})
+    
+    if format not in EXPORT_FORMATS:
+        return jsonify({'success': False, 'error': '不支持的导出格式'})
+    
+    _prune_jobs(export_jobs, EXPORT_JOB_TTL)
+    
+    # 同一用户对同一报告、同一格式的导出仍在进行时复用该任务（如重复点击），不重复生成
+    job_id = next((
+        existing_id for existing_id, job in list(export_jobs.items())
+        if job['report_id'] == report_id and job['format'] == format
+        and job['username'] == username and not job['future'].done()
+    ), None)
+    if job_id is not None:
+        return jsonify({
+            'success': True,
+            'job_id': job_id,
+            'status_url': url_for('get_export_status', job_id=job_id),
+            'download_url': url_for('download_export', job_id=job_id)
+        })
+    
+    job_id = secrets.token_hex(8)
+    export_jobs[job_id] = {
+        'future': _export_executor.submit(_run_export_job, report_id, format, report_data),
+        'report_id': report_id,
+        'format': format,
+        'username': username,
+        'created': time.monotonic()
+    }
+    
+    return jsonify({
+        'success': True,
+        'job_id': job_id,
+        'status_url': url_for('get_export_status', job_id=job_id),
+        'download_url': url_for('download_export', job_id=job_id)
+    })
+
+
+@app.route('/api/export_status/<job_id>')
+@login_required
+def get_export_status(job_id):
+    """查询导出任务状态"""
+    job = _get_export_job(job_id, session.get('username'), session.get('role'))
+    if job is None:
+        return jsonify({'success': False, 'error': '导出任务不存在'})
+    
+    future = job['future']
+    if not future.done():
+        return jsonify({'success': True, 'status': 'pending'})
+    
+    if future.exception() is not None or future.result()[0] is None:
+        export_jobs.pop(job_id, None)
+        error = future.exception()
+        return jsonify({
+            'success': False,
+            'status': 'error',
+            'error': f'导出失败: {str(error)}' if error else '导出失败'
+        })
+    
+    return jsonify({'success': True, 'status': 'done'})
+
+
+@app.route('/download/<job_id>')
+@login_required
+def download_export(job_id):
+    """下载已完成的导出文件"""
+    username = session.get('username')
+    job = _get_export_job(job_id, username, session.get('role'))
+    if job is None or not job['future'].done():
+        return "导出任务不存在或尚未完成", 404
+    
+    future = job['future']
+    if future.exception() is not None or future.result()[0] is None:
+        return "导出失败", 500
+    
+    filepath, filename = future.result()
+    report_data = report_storage.get(job['report_id'])
+    if report_data is None or not os.path.exists(filepath):
+        return "报告不存在", 404
+    
+    export_jobs.pop(job_id, None)
+    record_export(job['report_id'], job['format'], report_data, filename, filepath,
+                  username, session.get('fullname'))
+    
+    return send_export_file(filepath, filename)
+
+
+def recent_operation_logs(n):
+    """按索引从右端取最近n条操作记录，避免为切片复制整个deque"""
+    n = min(n, len(operation_logs))
+    return [operation_logs[i] for i in range(-n, 0)]
+
+
 @app.route('/api/logs')
 @login_required
 def get_logs():
     """获取操作日志"""
     return jsonify({
         'success': True,
-        'logs': operation_logs[-20:]  # 返回最近20条
+        'logs': recent_operation_logs(20)  # 返回最近20条
     })
 
 
@@ -599,10 +1564,10 @@ def get_system_info():
     if role == 'admin':
         # 管理员可以看到所有数据
         user_report_count = len(report_storage)
-        active_users = sum(1 for u in users_db.values() if u.get('status') == 'active')
+        active_users = _active_user_count
     else:
         # 普通用户只能看到自己的报告
-        user_report_count = sum(1 for r in report_storage.values() if r.get('created_by') == username)
+        user_report_count = len(reports_by_user.get(username, ()))
         active_users = 1
     
     return jsonify({
@@ -619,6 +1584,31 @@ def get_system_info():
     })
 
 
+@app.route('/api/admin/dump_reports')
+@login_required
+@admin_required
+def dump_reports():
+    """导出报告存储的JSON快照（调试用），pretty=1时缩进输出"""
+    option = ORJSON_OPTIONS
+    if request.args.get('pretty') == '1':
+        option |= orjson.OPT_INDENT_2
+    body = orjson.dumps(dict(report_storage), default=json_default, option=option)
+    return app.response_class(body, mimetype='application/json')
+
+
+def _report_summary(report_id, report_data):
+    """报告列表页展示所需的摘要字段"""
+    return {
+        'report_id': report_id,
+        'company_name': report_data.get('basic_info', {}).get('企业名称', '未知企业'),
+        'generated_at': report_data.get('generated_at', '未知时间'),
+        'created_by': report_data.get('created_by', '未知'),
+        'created_by_name': report_data.get('created_by_name', '未知用户'),
+        'filename': report_data.get('filename', '未知文件'),
+        'years': report_data.get('years', [])
+    }
+
+
 @app.route('/reports')
 @login_required
 def reports_list():
@@ -627,23 +1617,19 @@ def reports_list():
     username = session.get('username')
     role = session.get('role')
     
-    # 准备报告列表数据
-    reports = []
-    for report_id, report_data in report_storage.items():
-        # 管理员可以看到所有报告，普通用户只能看到自己的报告
-        if role == 'admin' or report_data.get('created_by') == username:
-            reports.append({
-                'report_id': report_id,
-                'company_name': report_data.get('basic_info', {}).get('企业名称', '未知企业'),
-                'generated_at': report_data.get('generated_at', '未知时间'),
-                'created_by': report_data.get('created_by', '未知'),
-                'created_by_name': report_data.get('created_by_name', '未知用户'),
-                'filename': report_data.get('filename', '未知文件'),
-                'years': report_data.get('years', [])
-            })
+    # 准备报告列表数据：管理员可以看到所有报告，普通用户只能看到自己的报告
+    # 倒序读取已排好序的索引即为按生成时间倒序，无需每次排序
+    with _report_index_lock:
+        if role == 'admin':
+            ordered_keys = _sorted_reports[::-1]
+        else:
+            ordered_keys = _sorted_reports_by_user.get(username, [])[::-1]
     
-    # 按生成时间倒序排序
-    reports.sort(key=lambda x: x['generated_at'], reverse=True)
+    reports = []
+    for _, report_id in ordered_keys:
+        report_data = report_storage.get(report_id)
+        if report_data is not None:
+            reports.append(_report_summary(report_id, report_data))
     
     return render_template('reports_list.html', reports=reports, user=session)
 
@@ -667,18 +1653,20 @@ def delete_report(report_id):
     # 删除报告
     company_name = report.get('basic_info', {}).get('企业名称', '未知企业')
     del report_storage[report_id]
+    unindex_report(report_id, report)
+    clear_export_cache(report_id)
     
-    # 持久化保存
-    save_reports()
+    # 持久化保存（后台批量写入）
+    mark_report_deleted(report_id)
     
     # 记录操作
-    operation_logs.append({
+    log_operation({
         'type': '删除报告',
         'report_id': report_id,
         'company': company_name,
         'username': username,
         'fullname': session.get('fullname'),
-        'time': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        'time': now_str()
     })
     
     return jsonify({'success': True, 'message': '报告已删除'})
@@ -702,7 +1690,7 @@ def get_download_records():
     if role == 'admin':
         filtered_records = download_records
     else:
-        filtered_records = [r for r in download_records if r.get('username') == username]
+        filtered_records = downloads_by_user.get(username, [])
     
     return jsonify({
         'success': True,
@@ -718,27 +1706,23 @@ def get_download_records():
 def clear_uploads():
     """清理上传文件夹（仅管理员）"""
     try:
-        import glob
-        
-        # 获取所有上传文件
-        upload_files = glob.glob(os.path.join(Config.UPLOAD_FOLDER, '*'))
-        
-        # 删除所有文件
+        # 删除所有文件（scandir的目录项自带文件类型，无需逐个stat；不跟随符号链接）
         deleted_count = 0
-        for file_path in upload_files:
-            if os.path.isfile(file_path):
-                try:
-                    os.remove(file_path)
-                    deleted_count += 1
-                except Exception as e:
-                    print(f"删除文件失败: {file_path}, 错误: {str(e)}")
+        with os.scandir(Config.UPLOAD_FOLDER) as entries:
+            for entry in entries:
+                if entry.is_file(follow_symlinks=False):
+                    try:
+                        os.remove(entry.path)
+                        deleted_count += 1
+                    except Exception as e:
+                        print(f"删除文件失败: {entry.path}, 错误: {str(e)}")
         
         # 记录操作
-        operation_logs.append({
+        log_operation({
             'type': '清理上传文件',
             'operator': session.get('username'),
             'count': deleted_count,
-            'time': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+            'time': now_str()
         })
         
         return jsonify({
@@ -758,13 +1742,9 @@ def clear_uploads():
 def get_upload_file_count():
     """获取上传文件数量（仅管理员）"""
     try:
-        import glob
-        
-        # 获取所有上传文件
-        upload_files = glob.glob(os.path.join(Config.UPLOAD_FOLDER, '*'))
-        
         # 只统计文件，不包括文件夹
-        file_count = sum(1 for f in upload_files if os.path.isfile(f))
+        with os.scandir(Config.UPLOAD_FOLDER) as entries:
+            file_count = sum(1 for entry in entries if entry.is_file(follow_symlinks=False))
         
         return jsonify({
             'success': True,
@@ -780,10 +1760,44 @@ def get_upload_file_count():
 # 已删除系统设置功能
 # 已删除 MySQL 企业数据功能
 
+# ========== 后台AI对话任务 ==========
+# 调用大模型耗时较长，放到线程池中执行，请求线程立即返回任务ID，前端轮询结果
+
+CHAT_JOB_TTL = 600  # 未取走结果的对话任务保留时间（秒）
+
+_chat_executor = ThreadPoolExecutor(max_workers=16, thread_name_prefix='aifi-chat')
+
+# 对话任务：{任务ID: {'future': Future, 'username': ..., 'created': ...}}
+chat_jobs = {}
+
+
+def _run_chat_job(report_id, report_data, question, username):
+    """后台调用AI回答问题并记录操作"""
+    try:
+        answer = get_chat_analyzer().answer_question(
+            question=question,
+            report_data=report_data,
+            company_info=report_data.get('basic_info', {})
+        )
+    except Exception:
+        logger.exception('AI对话处理失败 %s', report_id)
+        raise
+    
+    # 记录操作
+    log_operation({
+        'type': 'AI对话',
+        'username': username,
+        'report_id': report_id,
+        'question': question[:50] + ('...' if len(question) > 50 else ''),
+        'time': now_str()
+    })
+    return answer
+
+
 @app.route('/api/chat', methods=['POST'])
 @login_required
 def ai_chat():
-    """AI对话接口 - 回答用户关于报告的问题"""
+    """AI对话接口 - 提交关于报告的问题，返回任务ID"""
     try:
         data = request.get_json()
         report_id = data.get('report_id')
@@ -804,44 +1818,57 @@ def ai_chat():
         if role != 'admin' and report_data.get('created_by') != username:
             return jsonify({'success': False, 'error': '无权访问此报告'})
         
-        # 导入AI分析器
-        from modules.ai_analyzer import AIAnalyzer
-        ai_analyzer = AIAnalyzer()
-        
-        # 获取企业基本信息
-        company_info = report_data.get('basic_info', {})
-        
-        # 调用AI回答问题
-        answer = ai_analyzer.answer_question(
-            question=question,
-            report_data=report_data,
-            company_info=company_info
-        )
+        _prune_jobs(chat_jobs, CHAT_JOB_TTL)
         
-        # 记录操作
-        operation_logs.append({
-            'type': 'AI对话',
+        job_id = secrets.token_hex(8)
+        chat_jobs[job_id] = {
+            'future': _chat_executor.submit(_run_chat_job, report_id, report_data, question, username),
             'username': username,
-            'report_id': report_id,
-            'question': question[:50] + ('...' if len(question) > 50 else ''),
-            'time': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        })
+            'created': time.monotonic()
+        }
         
         return jsonify({
             'success': True,
-            'answer': answer
+            'job_id': job_id,
+            'status_url': url_for('get_chat_result', job_id=job_id)
         })
         
     except Exception as e:
-        print(f"AI对话处理失败: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        logger.exception('AI对话处理失败')
         return jsonify({
             'success': False,
             'error': f'处理失败: {str(e)}'
         })
 
 
+@app.route('/api/chat_result/<job_id>')
+@login_required
+def get_chat_result(job_id):
+    """查询AI对话任务结果"""
+    job = chat_jobs.get(job_id)
+    if job is None or job['username'] != session.get('username'):
+        return jsonify({'success': False, 'error': '对话任务不存在'})
+    
+    future = job['future']
+    if not future.done():
+        return jsonify({'success': True, 'status': 'pending'})
+    
+    chat_jobs.pop(job_id, None)
+    error = future.exception()
+    if error is not None:
+        return jsonify({
+            'success': False,
+            'status': 'error',
+            'error': f'处理失败: {str(error)}'
+        })
+    
+    return jsonify({
+        'success': True,
+        'status': 'done',
+        'answer': future.result()
+    })
+
+
 @app.errorhandler(404)
 def not_found(error):
     """404错误处理"""
@@ -854,11 +1881,22 @@ def internal_error(error):
     return "服务器内部错误", 500
 
 
-if __name__ == '__main__':
-    # 加载历史报告和用户数据
+def init_data():
+    """加载历史报告、用户数据、下载记录和操作日志（开发服务器与WSGI入口共用）"""
     load_reports()
     load_users()
     load_download_records()
+    load_operation_logs()
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(name)s: %(message)s')
+    
+    # 加载历史报告和用户数据
+    init_data()
+    
+    # 收到SIGTERM时正常退出，以便atexit写出待保存的数据
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
     
     print("=" * 50)
     print("AIFI 智能财报系统启动中...")
@@ -869,4 +1907,5 @@ if __name__ == '__main__':
     print(f"系统用户: {len(users_db)} 个")
     print(f"下载记录: {len(download_records)} 条")
     print("=" * 50)
-    app.run(debug=True, host='0.0.0.0', port=5000)
+    # 开发服务器仅用于本地调试；生产环境通过 wsgi.py 使用gunicorn运行
+    app.run(debug=os.getenv('FLASK_DEBUG') == '1', threaded=True, host='0.0.0.0', port=5000)
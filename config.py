@@ -10,11 +10,23 @@ class Config:
     # 文件上传配置
     UPLOAD_FOLDER = 'uploads'
     EXPORT_FOLDER = 'exports'
+    EXPORT_CACHE_FOLDER = os.path.join('exports', 'cache')
+    EXPORT_CACHE_MAX_MB = 512  # 导出文件缓存上限
     DATA_FOLDER = 'data'
+    REPORTS_STREAM_LOAD_MB = 100  # 报告存储文件超过该大小时使用ijson流式加载
+    REPORTS_GZIP_LEVEL = int(os.getenv('REPORTS_GZIP_LEVEL', '0'))  # 报告文件gzip压缩级别，0为不压缩
+    OPERATION_LOGS_MAX = 2000  # 内存中保留的最近操作记录条数
+    OPERATION_LOGS_FILE_MAX_MB = 20  # 操作日志文件超过该大小时轮转
     STATIC_FOLDER = 'static'
-    ALLOWED_EXTENSIONS = {'xlsx', 'xls'}
+    ALLOWED_EXTENSIONS = frozenset({'xlsx', 'xls'})  # 小写，不可变
     MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB
     
+    # 导出文件下载交给前端服务器发送（不占用Python工作线程）
+    # Apache(mod_xsendfile)：设置 USE_X_SENDFILE=1
+    # nginx：设置 X_ACCEL_REDIRECT_PREFIX 为对应 internal location，如 /internal_export/
+    USE_X_SENDFILE = os.getenv('USE_X_SENDFILE') == '1'
+    X_ACCEL_REDIRECT_PREFIX = os.getenv('X_ACCEL_REDIRECT_PREFIX', '')
+    
     # OpenAI配置（兼容多种AI服务）
     OPENAI_API_KEY = os.getenv('OPENAI_API_KEY', '')
     OPENAI_API_BASE = os.getenv('OPENAI_API_BASE', 'https://api.openai.com/v1')
@@ -23,8 +35,8 @@ class Config:
     # 确保必要的目录存在
     @staticmethod
     def init_app():
-        for folder in [Config.UPLOAD_FOLDER, Config.EXPORT_FOLDER, Config.DATA_FOLDER, 
-                      os.path.join(Config.STATIC_FOLDER, 'charts')]:
+        for folder in [Config.UPLOAD_FOLDER, Config.EXPORT_FOLDER, Config.EXPORT_CACHE_FOLDER,
+                      Config.DATA_FOLDER, os.path.join(Config.STATIC_FOLDER, 'charts')]:
             if not os.path.exists(folder):
                 os.makedirs(folder)
 
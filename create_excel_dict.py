@@ -4,19 +4,15 @@ import pandas as pd
 from field_dictionary import FIELD_DICTIONARY, FIELD_CATEGORIES, FIELD_TYPES
 
 def create_excel_dictionary():
-    # 1. 字段映射表
-    field_mapping = []
-    for chinese, english in FIELD_DICTIONARY.items():
-        field_mapping.append({
-            '中文字段名': chinese,
-            '英文字段名': english,
-            '数据类型': FIELD_TYPES.get(chinese, 'string')
-        })
-    
-    df_mapping = pd.DataFrame(field_mapping)
+    # 1. 字段映射表（按列构建，不逐行创建字典）
+    chinese_names = list(FIELD_DICTIONARY)
+    df_mapping = pd.DataFrame({
+        '中文字段名': chinese_names,
+        '英文字段名': list(FIELD_DICTIONARY.values()),
+        '数据类型': [FIELD_TYPES[name] for name in chinese_names]
+    })
     
     # 2. 字段分类表
-    category_data = []
     category_names = {
         'basic_info': '基本信息',
         'balance_sheet_2023': '2023年资产负债表',
@@ -27,28 +23,27 @@ def create_excel_dictionary():
         'cash_flow_2022': '2022年现金流量表'
     }
     
-    for category, fields in FIELD_CATEGORIES.items():
-        for field in fields:
-            category_data.append({
-                '分类代码': category,
-                '分类名称': category_names.get(category, category),
-                '字段名': field,
-                '英文名': FIELD_DICTIONARY.get(field, ''),
-                '数据类型': FIELD_TYPES.get(field, 'string')
-            })
+    category_codes = []
+    fields = []
+    for category, category_fields in FIELD_CATEGORIES.items():
+        category_codes.extend([category] * len(category_fields))
+        fields.extend(category_fields)
     
-    df_categories = pd.DataFrame(category_data)
+    df_categories = pd.DataFrame({
+        '分类代码': category_codes,
+        '分类名称': [category_names.get(code, code) for code in category_codes],
+        '字段名': fields,
+        '英文名': [FIELD_DICTIONARY[field] for field in fields],
+        '数据类型': [FIELD_TYPES[field] for field in fields]
+    })
     
     # 3. 分类统计表
-    category_stats = []
-    for category, fields in FIELD_CATEGORIES.items():
-        category_stats.append({
-            '分类代码': category,
-            '分类名称': category_names.get(category, category),
-            '字段数量': len(fields)
-        })
-    
-    df_stats = pd.DataFrame(category_stats)
+    categories = list(FIELD_CATEGORIES)
+    df_stats = pd.DataFrame({
+        '分类代码': categories,
+        '分类名称': [category_names.get(category, category) for category in categories],
+        '字段数量': [len(FIELD_CATEGORIES[category]) for category in categories]
+    })
     
     # 写入Excel文件
     with pd.ExcelWriter('字段字典_新版.xlsx', engine='openpyxl') as writer:
@@ -1,4 +1,6 @@
 # Excel模板字段字典
+from types import MappingProxyType
+
 FIELD_DICTIONARY = {
     # 基本信息字段
     '企业名称': 'company_name',
@@ -98,8 +100,8 @@ FIELD_CATEGORIES = {
     ]
 }
 
-# 数据类型字典
-FIELD_TYPES = {
+# 基本信息字段的数据类型，其余（财务）字段均为numeric
+_BASIC_FIELD_TYPES = {
     '企业名称': 'string',
     '统一社会信用代码': 'string',
     '注册资本（万元）': 'numeric',
@@ -115,10 +117,13 @@ FIELD_TYPES = {
     '经营范围': 'string'
 }
 
-# 为所有财务字段添加numeric类型
-for field in FIELD_DICTIONARY.keys():
-    if field not in FIELD_TYPES:
-        FIELD_TYPES[field] = 'numeric'
+# 数据类型字典：导入时一次性生成，覆盖FIELD_DICTIONARY中的全部字段，可直接用下标访问
+FIELD_TYPES = {field: _BASIC_FIELD_TYPES.get(field, 'numeric') for field in FIELD_DICTIONARY}
+
+# 静态映射在导入后冻结为只读视图，防止被意外修改
+FIELD_DICTIONARY = MappingProxyType(FIELD_DICTIONARY)
+FIELD_CATEGORIES = MappingProxyType({category: tuple(fields) for category, fields in FIELD_CATEGORIES.items()})
+FIELD_TYPES = MappingProxyType(FIELD_TYPES)
 
 # 使用示例
 def get_english_field_name(chinese_field):
@@ -127,7 +132,7 @@ def get_english_field_name(chinese_field):
 
 def get_fields_by_category(category):
     """根据分类获取字段列表"""
-    return FIELD_CATEGORIES.get(category, [])
+    return list(FIELD_CATEGORIES.get(category, ()))
 
 def get_field_type(field):
     """获取字段数据类型"""
@@ -1,53 +1,89 @@
 """修复已存在报告的HTML标签问题"""
-import json
 import os
 import re
 
+import orjson
+
+from storage import (REPORTS_DIR, REPORTS_STORAGE_FILE, ORJSON_OPTIONS, json_default,
+                     write_file_atomic, report_id_from_filename, read_report_file, write_report_file)
+
+# 一次扫描同时处理<br>（转换为换行）与其他HTML标签（移除）
+_TAG_RE = re.compile(r'(<br\s*/?>)|<[^>]+>')
+_BLANK_LINES_RE = re.compile(r'\n{3,}')
+
+
+def _replace_tag(match):
+    return '\n' if match.group(1) else ''
+
+
 def strip_html_tags(text):
     """移除HTML标签"""
     if not text:
         return text
     
-    # 将<br>转换为换行
-    text = re.sub(r'<br\s*/?>', '\n', text)
-    
-    # 移除所有HTML标签
-    text = re.sub(r'<[^>]+>', '', text)
+    # 将<br>转换为换行，移除其他HTML标签
+    text = _TAG_RE.sub(_replace_tag, text)
     
     # 清理多余的空白
-    text = re.sub(r'\n{3,}', '\n\n', text)
+    text = _BLANK_LINES_RE.sub('\n\n', text)
     
     return text.strip()
 
+def fix_report(report_id, report):
+    """修复单个报告，返回是否有修改"""
+    changed = False
+    
+    # 添加PDF版本的dimension_analyses
+    if 'dimension_analyses' in report and 'dimension_analyses_pdf' not in report:
+        report['dimension_analyses_pdf'] = {}
+        for dimension, analysis in report['dimension_analyses'].items():
+            report['dimension_analyses_pdf'][dimension] = strip_html_tags(analysis)
+        print(f"✓ 修复报告 {report_id} 的dimension_analyses")
+        changed = True
+    
+    # 添加PDF版本的overall_assessment
+    if 'overall_assessment' in report and 'overall_assessment_pdf' not in report:
+        report['overall_assessment_pdf'] = strip_html_tags(report['overall_assessment'])
+        print(f"✓ 修复报告 {report_id} 的overall_assessment")
+        changed = True
+    
+    return changed
+
 def fix_reports():
     """修复所有报告"""
-    storage_file = 'data/reports_storage.json'
+    # 每个报告一个文件的存储格式
+    if os.path.isdir(REPORTS_DIR):
+        filenames = [name for name in os.listdir(REPORTS_DIR) if report_id_from_filename(name)]
+        print(f"找到 {len(filenames)} 个报告，开始修复...")
+        
+        for name in filenames:
+            report = read_report_file(name)
+            if report is None:
+                continue
+            report_id = report_id_from_filename(name)
+            if fix_report(report_id, report):
+                # 与应用相同的序列化、压缩设置和原子写入，中途退出不会损坏报告文件
+                write_report_file(report_id, report)
+        
+        print(f"\n修复完成！已处理 {len(filenames)} 个报告")
+        print("现在可以重新导出PDF了")
+        return
     
-    if not os.path.exists(storage_file):
+    if not os.path.exists(REPORTS_STORAGE_FILE):
         print("未找到报告文件")
         return
     
-    with open(storage_file, 'r', encoding='utf-8') as f:
-        reports = json.load(f)
+    with open(REPORTS_STORAGE_FILE, 'rb') as f:
+        reports = orjson.loads(f.read())
     
     print(f"找到 {len(reports)} 个报告，开始修复...")
     
     for report_id, report in reports.items():
-        # 添加PDF版本的dimension_analyses
-        if 'dimension_analyses' in report and 'dimension_analyses_pdf' not in report:
-            report['dimension_analyses_pdf'] = {}
-            for dimension, analysis in report['dimension_analyses'].items():
-                report['dimension_analyses_pdf'][dimension] = strip_html_tags(analysis)
-            print(f"✓ 修复报告 {report_id} 的dimension_analyses")
-        
-        # 添加PDF版本的overall_assessment
-        if 'overall_assessment' in report and 'overall_assessment_pdf' not in report:
-            report['overall_assessment_pdf'] = strip_html_tags(report['overall_assessment'])
-            print(f"✓ 修复报告 {report_id} 的overall_assessment")
+        fix_report(report_id, report)
     
     # 保存
-    with open(storage_file, 'w', encoding='utf-8') as f:
-        json.dump(reports, f, ensure_ascii=False, indent=2)
+    write_file_atomic(REPORTS_STORAGE_FILE,
+                      orjson.dumps(reports, default=json_default, option=ORJSON_OPTIONS))
     
     print(f"\n修复完成！已处理 {len(reports)} 个报告")
     print("现在可以重新导出PDF了")
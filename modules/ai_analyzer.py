@@ -3,10 +3,19 @@ AI分析模块
 负责调用大语言模型进行风险分析和解读
 """
 
+import re
+import hashlib
+import threading
+from collections import OrderedDict
 from openai import OpenAI
 from typing import Dict, Optional, List
 from config import Config
 
+# 问答结果缓存：{(模型, 提示词哈希): 回答}，同一报告的相同问题直接返回已有回答
+ANSWER_CACHE_SIZE = 1024
+_answer_cache = OrderedDict()
+_answer_cache_lock = threading.Lock()
+
 class AIAnalyzer:
     """AI风险分析器"""
     
@@ -37,7 +46,6 @@ class AIAnalyzer:
         Returns:
             str: 清理后的文本
         """
-        import re
         
         # 移除加粗标记 **text**
         text = re.sub(r'\*\*([^*]+)\*\*', r'\1', text)
@@ -68,7 +76,6 @@ class AIAnalyzer:
         Returns:
             str: 格式化后的文本（包含HTML标记）
         """
-        import re
         
         # 先清理Markdown
         text = self._clean_markdown(text)
@@ -158,7 +165,6 @@ class AIAnalyzer:
         Returns:
             str: 纯文本（移除所有HTML标签）
         """
-        import re
         
         # 先将<br>转换为换行（在移除其他标签之前）
         text = re.sub(r'<br\s*/?>', '\n', text)
@@ -191,6 +197,11 @@ class AIAnalyzer:
         
         return text
     
+    @staticmethod
+    def _has_valid_indicators(indicators: Dict[str, Optional[float]]) -> bool:
+        """判断指标数据中是否存在非空值"""
+        return any(v is not None for v in indicators.values())
+    
     def analyze_dimension_risk(self, 
                                dimension_name: str,
                                indicators: Dict[str, Optional[float]],
@@ -208,8 +219,8 @@ class AIAnalyzer:
         Returns:
             str: 风险分析文本
         """
-        # 如果API密钥未配置，返回默认分析
-        if not Config.OPENAI_API_KEY:
+        # 如果API密钥未配置，或该维度没有任何有效指标，返回默认分析（无需调用AI）
+        if not Config.OPENAI_API_KEY or not self._has_valid_indicators(indicators):
             return self._get_default_analysis(dimension_name, indicators, year_data)
         
         try:
@@ -415,7 +426,10 @@ class AIAnalyzer:
             str: 整体风险评估文本
         """
         
-        if not Config.OPENAI_API_KEY:
+        # 所有维度都没有有效指标时，AI也只能给出泛泛的结论，直接使用默认评估
+        if not Config.OPENAI_API_KEY or not any(
+            self._has_valid_indicators(indicators) for indicators in all_indicators.values()
+        ):
             return self._get_default_overall_assessment(dimension_analyses, all_indicators, company_info)
         
         try:
@@ -687,7 +701,7 @@ class AIAnalyzer:
 主要财务指标：
 {context['key_indicators']}
 
-用户问题：{question}
+用户问题：{question.strip()}
 
 请基于报告数据给出专业、准确的回答。要求：
 1. 回答要简洁明了，突出重点
@@ -697,6 +711,14 @@ class AIAnalyzer:
 5. 控制在200字以内
 """
             
+            # 提示词包含报告上下文与问题，内容相同即可复用之前的回答
+            cache_key = (self.model, hashlib.blake2b(prompt.encode('utf-8'), digest_size=16).digest())
+            with _answer_cache_lock:
+                cached = _answer_cache.get(cache_key)
+                if cached is not None:
+                    _answer_cache.move_to_end(cache_key)
+                    return cached
+            
             response = self.client.chat.completions.create(
                 model=self.model,
                 messages=[
@@ -708,6 +730,12 @@ class AIAnalyzer:
             )
             
             answer = response.choices[0].message.content.strip()
+            
+            # 只缓存模型返回的回答，调用失败时的默认回答不缓存
+            with _answer_cache_lock:
+                _answer_cache[cache_key] = answer
+                while len(_answer_cache) > ANSWER_CACHE_SIZE:
+                    _answer_cache.popitem(last=False)
             return answer
             
         except Exception as e:
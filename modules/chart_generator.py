@@ -4,6 +4,12 @@
 """
 
 import os
+import re
+import json
+import hashlib
+import secrets
+import threading
+import logging
 import matplotlib.pyplot as plt
 import matplotlib
 import plotly.graph_objects as go
@@ -14,11 +20,21 @@ from typing import Dict, List, Tuple, Optional
 import base64
 import io
 from datetime import datetime
+from collections import OrderedDict
+from .indicator_calculator import IndicatorCalculator
 
 # 设置中文字体支持
 matplotlib.rcParams['font.sans-serif'] = ['SimHei', 'Microsoft YaHei', 'Arial']
 matplotlib.rcParams['axes.unicode_minus'] = False
 
+# 图表结果缓存：{输入内容哈希: 图表路径映射}，相同输入重复生成报告时跳过渲染
+CHARTS_CACHE_SIZE = 128
+_charts_cache = OrderedDict()
+_charts_cache_lock = threading.Lock()
+
+logger = logging.getLogger(__name__)
+
+
 class ChartGenerator:
     """财务图表生成器"""
     
@@ -115,48 +131,119 @@ class ChartGenerator:
         if not years or not indicators:
             return charts
         
+        # 图表只依赖年份、指标和维度分析，内容相同时复用已生成的图表文件
+        try:
+            cache_key = self._charts_cache_key(years, indicators, dimension_analyses)
+        except (TypeError, ValueError):
+            # 输入包含无法序列化的键时不使用缓存
+            cache_key = None
+        
+        cached = None
+        if cache_key is not None:
+            with _charts_cache_lock:
+                cached = _charts_cache.get(cache_key)
+                if cached is not None:
+                    _charts_cache.move_to_end(cache_key)
+        if cached is not None and self._charts_exist(cached, cache_key):
+            return dict(cached)
+        
+        # 文件名带上缓存键和随机后缀：同一秒内并发生成的报告不会互相覆盖图表文件，
+        # 缓存命中时也可据此确认文件属于该缓存键
+        chart_tag = f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{(cache_key or '')[:16]}{secrets.token_hex(4)}"
+        charts, complete = self._render_all_charts(years, indicators, dimension_analyses, chart_tag)
+        
+        # 部分图表渲染失败时不缓存，下次相同输入重新渲染
+        if complete and cache_key is not None:
+            with _charts_cache_lock:
+                _charts_cache[cache_key] = dict(charts)
+                _charts_cache.move_to_end(cache_key)
+                while len(_charts_cache) > CHARTS_CACHE_SIZE:
+                    _charts_cache.popitem(last=False)
+        
+        return charts
+    
+    @staticmethod
+    def _charts_cache_key(years: List[int], indicators: Dict, dimension_analyses: Dict) -> str:
+        """根据图表输入内容计算缓存键"""
+        payload = json.dumps(
+            {'y': years, 'i': indicators, 'd': dimension_analyses},
+            sort_keys=True, default=str, ensure_ascii=False
+        )
+        return hashlib.blake2b(payload.encode('utf-8'), digest_size=16).hexdigest()
+    
+    def _charts_exist(self, charts: Dict[str, str], cache_key: str) -> bool:
+        """检查缓存的图表文件是否由该缓存键生成且仍然存在（图表目录可能已被清理）"""
+        for path in charts.values():
+            if not path:
+                continue
+            if cache_key[:16] not in os.path.basename(path):
+                return False
+            if path.startswith('/static/'):
+                path = os.path.join(self.static_folder, path[len('/static/'):])
+            if not os.path.exists(path):
+                return False
+        return True
+    
+    def _render_all_charts(self, years: List[int], indicators: Dict, dimension_analyses: Dict,
+                           chart_tag: str) -> Tuple[Dict[str, str], bool]:
+        """
+        渲染所有图表
+        
+        Args:
+            years: 年份列表
+            indicators: 各年份指标
+            dimension_analyses: 各维度分析
+            chart_tag: 本次渲染的图表文件名后缀
+            
+        Returns:
+            Tuple[Dict[str, str], bool]: 图表名称到文件路径的映射，以及是否全部图表都渲染成功
+        """
+        charts = {}
+        
+        # 按维度、指标整理各年份的数值序列，各图表直接取用
+        series = IndicatorCalculator.to_series(indicators, years)
+        
         try:
             # 1. 主要财务指标对比图
-            html_path, png_path = self._generate_main_indicators_chart(years, indicators)
+            html_path, png_path = self._generate_main_indicators_chart(years, indicators, chart_tag)
             charts['main_indicators'] = html_path
             charts['main_indicators_png'] = png_path
             
             # 2. 盈利能力趋势图
-            html_path, png_path = self._generate_profitability_chart(years, indicators)
+            html_path, png_path = self._generate_profitability_chart(years, series, chart_tag)
             charts['profitability'] = html_path
             charts['profitability_png'] = png_path
             
             # 3. 偿债能力分析图
-            html_path, png_path = self._generate_solvency_chart(years, indicators)
+            html_path, png_path = self._generate_solvency_chart(years, series, chart_tag)
             charts['solvency'] = html_path
             charts['solvency_png'] = png_path
             
             # 4. 运营能力分析图
-            html_path, png_path = self._generate_operational_chart(years, indicators)
+            html_path, png_path = self._generate_operational_chart(years, series, chart_tag)
             charts['operational'] = html_path
             charts['operational_png'] = png_path
             
             # 5. 现金流分析图
-            html_path, png_path = self._generate_cashflow_chart(years, indicators)
+            html_path, png_path = self._generate_cashflow_chart(years, series, chart_tag)
             charts['cashflow'] = html_path
             charts['cashflow_png'] = png_path
             
             # 6. 风险评估雷达图
-            html_path, png_path = self._generate_risk_radar_chart(dimension_analyses)
+            html_path, png_path = self._generate_risk_radar_chart(dimension_analyses, chart_tag)
             charts['risk_radar'] = html_path
             charts['risk_radar_png'] = png_path
             
             # 7. 综合财务健康度仪表盘
-            html_path, png_path = self._generate_health_dashboard(indicators, dimension_analyses)
+            html_path, png_path = self._generate_health_dashboard(indicators, dimension_analyses, chart_tag)
             charts['health_dashboard'] = html_path
             charts['health_dashboard_png'] = png_path
             
-        except Exception as e:
-            print(f"生成图表时出错: {str(e)}")
-            import traceback
-            traceback.print_exc()
+        except Exception:
+            logger.exception('生成图表时出错')
+            return charts, False
         
-        return charts
+        return charts, True
     
     def _save_chart_as_png(self, fig, base_filename: str) -> str:
         """
@@ -208,7 +295,6 @@ class ChartGenerator:
     def _create_static_chart_fallback(self, plotly_fig, output_path: str):
         """使用matplotlib创建静态图表作为后备方案"""
         # 这是一个简化的后备方案，创建基本的图表
-        import matplotlib.pyplot as plt
         
         fig, ax = plt.subplots(figsize=(12, 6))
         ax.text(0.5, 0.5, '图表生成中...\n请安装 kaleido 以显示完整图表\npip install kaleido', 
@@ -219,7 +305,7 @@ class ChartGenerator:
         plt.close()
         print(f"✓ 生成占位图表: {output_path}")
     
-    def _generate_main_indicators_chart(self, years: List[int], indicators: Dict) -> Tuple[str, str]:
+    def _generate_main_indicators_chart(self, years: List[int], indicators: Dict, chart_tag: str) -> Tuple[str, str]:
         """生成主要财务指标对比图"""
         fig = make_subplots(
             rows=2, cols=2,
@@ -304,8 +390,7 @@ class ChartGenerator:
         fig.update_xaxes(automargin=True)
         
         # 保存图表
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        base_name = f"main_indicators_{timestamp}"
+        base_name = f"main_indicators_{chart_tag}"
         
         # HTML版本
         html_filename = f"{base_name}.html"
@@ -317,7 +402,7 @@ class ChartGenerator:
         
         return f"/static/charts/{html_filename}", png_filepath
     
-    def _generate_profitability_chart(self, years: List[int], indicators: Dict) -> Tuple[str, str]:
+    def _generate_profitability_chart(self, years: List[int], series: Dict, chart_tag: str) -> Tuple[str, str]:
         """生成盈利能力趋势图"""
         fig = go.Figure()
         
@@ -329,11 +414,9 @@ class ChartGenerator:
         }
         colors = [self.color_palette[0], self.color_palette[1], self.color_palette[2]]
         
+        profitability_series = series.get('盈利风险', {})
         for i, (full_name, short_name) in enumerate(metrics_mapping.items()):
-            values = []
-            for year in years:
-                profitability_data = indicators.get(year, {}).get('盈利风险', {})
-                values.append(profitability_data.get(full_name, 0))
+            values = profitability_series.get(full_name, [0] * len(years))
             
             fig.add_trace(go.Scatter(
                 x=years, y=values, 
@@ -383,8 +466,7 @@ class ChartGenerator:
         fig.add_hline(y=0, line_dash="dash", line_color="gray", 
                       annotation_text="盈亏平衡线")
         
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        base_name = f"profitability_{timestamp}"
+        base_name = f"profitability_{chart_tag}"
         
         html_filename = f"{base_name}.html"
         html_filepath = os.path.join(self.charts_folder, html_filename)
@@ -394,7 +476,7 @@ class ChartGenerator:
         
         return f"/static/charts/{html_filename}", png_filepath
     
-    def _generate_solvency_chart(self, years: List[int], indicators: Dict) -> Tuple[str, str]:
+    def _generate_solvency_chart(self, years: List[int], series: Dict, chart_tag: str) -> Tuple[str, str]:
         """生成偿债能力分析图"""
         fig = make_subplots(
             rows=1, cols=2,
@@ -402,18 +484,15 @@ class ChartGenerator:
             specs=[[{"type": "bar"}, {"type": "bar"}]]
         )
         
+        solvency_series = series.get('偿债风险', {})
+        missing = [0] * len(years)
+        
         # 短期偿债能力指标
-        current_ratios = []
-        quick_ratios = []
+        current_ratios = solvency_series.get('流动比率', missing)
+        quick_ratios = solvency_series.get('速动比率', missing)
         
         # 长期偿债能力指标  
-        asset_liability_ratios = []
-        
-        for year in years:
-            solvency_data = indicators.get(year, {}).get('偿债风险', {})
-            current_ratios.append(solvency_data.get('流动比率', 0))
-            quick_ratios.append(solvency_data.get('速动比率', 0))
-            asset_liability_ratios.append(solvency_data.get('资产负债率', 0))
+        asset_liability_ratios = solvency_series.get('资产负债率', missing)
         
         # 添加短期偿债能力图表
         fig.add_trace(go.Bar(name='流动比率', x=years, y=current_ratios, 
@@ -463,8 +542,7 @@ class ChartGenerator:
         fig.update_yaxes(automargin=True)
         fig.update_xaxes(automargin=True)
         
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        base_name = f"solvency_{timestamp}"
+        base_name = f"solvency_{chart_tag}"
         
         html_filename = f"{base_name}.html"
         html_filepath = os.path.join(self.charts_folder, html_filename)
@@ -474,7 +552,7 @@ class ChartGenerator:
         
         return f"/static/charts/{html_filename}", png_filepath
     
-    def _generate_operational_chart(self, years: List[int], indicators: Dict) -> Tuple[str, str]:
+    def _generate_operational_chart(self, years: List[int], series: Dict, chart_tag: str) -> Tuple[str, str]:
         """生成运营能力分析图"""
         fig = go.Figure()
         
@@ -487,11 +565,9 @@ class ChartGenerator:
         
         colors = [self.color_palette[0], self.color_palette[1], self.color_palette[2]]
         
+        operational_series = series.get('运营风险', {})
         for i, (metric, short_name) in enumerate(metrics.items()):
-            values = []
-            for year in years:
-                operational_data = indicators.get(year, {}).get('运营风险', {})
-                values.append(operational_data.get(metric, 0))
+            values = operational_series.get(metric, [0] * len(years))
             
             fig.add_trace(go.Bar(
                 name=short_name,
@@ -536,8 +612,7 @@ class ChartGenerator:
         fig.update_yaxes(automargin=True)
         fig.update_xaxes(automargin=True)
         
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        base_name = f"operational_{timestamp}"
+        base_name = f"operational_{chart_tag}"
         
         html_filename = f"{base_name}.html"
         html_filepath = os.path.join(self.charts_folder, html_filename)
@@ -547,18 +622,14 @@ class ChartGenerator:
         
         return f"/static/charts/{html_filename}", png_filepath
     
-    def _generate_cashflow_chart(self, years: List[int], indicators: Dict) -> Tuple[str, str]:
+    def _generate_cashflow_chart(self, years: List[int], series: Dict, chart_tag: str) -> Tuple[str, str]:
         """生成现金流分析图"""
         fig = go.Figure()
         
         # 现金流指标
-        operating_cashflow = []
-        cash_profit_ratio = []
-        
-        for year in years:
-            cashflow_data = indicators.get(year, {}).get('现金流风险', {})
-            operating_cashflow.append(cashflow_data.get('经营性净现金流', 0))
-            cash_profit_ratio.append(cashflow_data.get('现金利润比', 0))
+        cashflow_series = series.get('现金流风险', {})
+        operating_cashflow = cashflow_series.get('经营性净现金流', [0] * len(years))
+        cash_profit_ratio = cashflow_series.get('现金利润比', [0] * len(years))
         
         # 双轴图表
         fig = make_subplots(specs=[[{"secondary_y": True}]])
@@ -624,8 +695,7 @@ class ChartGenerator:
             hovermode='x unified'
         )
         
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        base_name = f"cashflow_{timestamp}"
+        base_name = f"cashflow_{chart_tag}"
         
         html_filename = f"{base_name}.html"
         html_filepath = os.path.join(self.charts_folder, html_filename)
@@ -635,7 +705,7 @@ class ChartGenerator:
         
         return f"/static/charts/{html_filename}", png_filepath
     
-    def _generate_risk_radar_chart(self, dimension_analyses: Dict) -> Tuple[str, str]:
+    def _generate_risk_radar_chart(self, dimension_analyses: Dict, chart_tag: str) -> Tuple[str, str]:
         """生成风险评估雷达图"""
         # 风险维度和对应的分数
         dimensions = ['盈利风险', '偿债风险', '运营风险', '现金流风险']
@@ -708,8 +778,7 @@ class ChartGenerator:
             showlegend=False
         )
         
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        base_name = f"risk_radar_{timestamp}"
+        base_name = f"risk_radar_{chart_tag}"
         
         html_filename = f"{base_name}.html"
         html_filepath = os.path.join(self.charts_folder, html_filename)
@@ -719,7 +788,7 @@ class ChartGenerator:
         
         return f"/static/charts/{html_filename}", png_filepath
     
-    def _generate_health_dashboard(self, indicators: Dict, dimension_analyses: Dict) -> Tuple[str, str]:
+    def _generate_health_dashboard(self, indicators: Dict, dimension_analyses: Dict, chart_tag: str) -> Tuple[str, str]:
         """生成财务健康度仪表盘"""
         fig = make_subplots(
             rows=2, cols=2,
@@ -866,8 +935,7 @@ class ChartGenerator:
             ]
         )
         
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        base_name = f"health_dashboard_{timestamp}"
+        base_name = f"health_dashboard_{chart_tag}"
         
         html_filename = f"{base_name}.html"
         html_filepath = os.path.join(self.charts_folder, html_filename)
@@ -1014,7 +1082,6 @@ class ChartGenerator:
     
     def _extract_risk_level_advanced(self, analysis_text: str) -> str:
         """从分析文本中提取风险等级（增强版本）"""
-        import re
         
         # 方法1：优先匹配标准格式 "风险等级：XXX"
         match = re.search(r'风险等级[：:]\s*(低风险|中等风险|高风险)', analysis_text)
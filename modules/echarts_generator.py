@@ -6,6 +6,9 @@ import json
 from typing import Dict, List, Tuple
 from datetime import datetime
 import os
+import logging
+
+logger = logging.getLogger(__name__)
 
 
 class EChartsGenerator:
@@ -69,10 +72,8 @@ class EChartsGenerator:
             # 7. 健康度仪表盘
             charts['health_dashboard'] = self._generate_health_dashboard(indicators, dimension_analyses)
             
-        except Exception as e:
-            print(f"生成图表时出错: {str(e)}")
-            import traceback
-            traceback.print_exc()
+        except Exception:
+            logger.exception('生成图表时出错')
         
         return charts
     
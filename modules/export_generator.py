@@ -11,14 +11,18 @@ from docx.oxml import OxmlElement
 from reportlab.lib.pagesizes import A4
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.units import inch
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, PageBreak
+from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, PageBreak, Image
 from reportlab.lib import colors
 from reportlab.pdfbase import pdfmetrics
 from reportlab.pdfbase.ttfonts import TTFont
 import os
+import logging
 from typing import Dict, Optional
 from datetime import datetime
 
+logger = logging.getLogger(__name__)
+
+
 class ExportGenerator:
     """报告导出生成器 - 专业版"""
     
@@ -517,10 +521,8 @@ class ExportGenerator:
             doc.save(output_path)
             return True
             
-        except Exception as e:
-            print(f"导出Word失败: {str(e)}")
-            import traceback
-            traceback.print_exc()
+        except Exception:
+            logger.exception('导出Word失败: %s', output_path)
             return False
     
     def export_to_pdf(self, report_data: Dict, output_path: str) -> bool:
@@ -715,7 +717,6 @@ class ExportGenerator:
             
             # 4.1 数据可视化分析（嵌入图片）
             if report_data.get('charts'):
-                from reportlab.platypus import Image
                 
                 story.append(Paragraph('三、数据可视化分析', heading1_style))
                 story.append(Spacer(1, 0.1*inch))
@@ -850,10 +851,8 @@ class ExportGenerator:
             doc.build(story)
             return True
             
-        except Exception as e:
-            print(f"导出PDF失败: {str(e)}")
-            import traceback
-            traceback.print_exc()
+        except Exception:
+            logger.exception('导出PDF失败: %s', output_path)
             return False
     
     def _register_chinese_fonts(self):
@@ -59,26 +59,21 @@ class IndicatorCalculator:
         
         balance = self.data[year].get('资产负债表', {})
         income = self.data[year].get('利润表', {})
+        revenue = income.get('营业收入')
+        cost = income.get('营业成本')
+        net_profit = income.get('净利润')
         
         # 净利润率 = 净利润 / 营业收入 * 100%
-        net_profit_margin = self._safe_divide(
-            income.get('净利润'),
-            income.get('营业收入'),
-            100
-        )
+        net_profit_margin = self._safe_divide(net_profit, revenue, 100)
         
         # 毛利率 = (营业收入 - 营业成本) / 营业收入 * 100%
         gross_profit = None
-        if income.get('营业收入') is not None and income.get('营业成本') is not None:
-            gross_profit = income.get('营业收入') - income.get('营业成本')
-        gross_profit_margin = self._safe_divide(gross_profit, income.get('营业收入'), 100)
+        if revenue is not None and cost is not None:
+            gross_profit = revenue - cost
+        gross_profit_margin = self._safe_divide(gross_profit, revenue, 100)
         
         # 净资产收益率 = 净利润 / 所有者权益 * 100%
-        roe = self._safe_divide(
-            income.get('净利润'),
-            balance.get('所有者权益'),
-            100
-        )
+        roe = self._safe_divide(net_profit, balance.get('所有者权益'), 100)
         
         return {
             '净利润率': net_profit_margin,
@@ -112,18 +107,18 @@ class IndicatorCalculator:
             100
         )
         
+        current_assets = balance.get('流动资产')
+        current_liabilities = balance.get('流动负债')
+        
         # 流动比率 = 流动资产 / 流动负债
-        current_ratio = self._safe_divide(
-            balance.get('流动资产'),
-            balance.get('流动负债')
-        )
+        current_ratio = self._safe_divide(current_assets, current_liabilities)
         
         # 速动比率 = (流动资产 - 存货) / 流动负债
         # 注：此处简化处理，假设存货数据可能缺失，使用流动资产的80%作为速动资产
-        quick_assets = balance.get('流动资产')
+        quick_assets = current_assets
         if quick_assets is not None:
             quick_assets = quick_assets * 0.8  # 简化估算
-        quick_ratio = self._safe_divide(quick_assets, balance.get('流动负债'))
+        quick_ratio = self._safe_divide(quick_assets, current_liabilities)
         
         return {
             '资产负债率': asset_liability_ratio,
@@ -151,27 +146,27 @@ class IndicatorCalculator:
         balance = self.data[year].get('资产负债表', {})
         income = self.data[year].get('利润表', {})
         
+        current_assets = balance.get('流动资产')
+        revenue = income.get('营业收入')
+        
         # 注：周转率指标需要平均值，此处简化使用期末值
         
         # 应收账款周转率 = 营业收入 / 应收账款
         # 假设应收账款约为流动资产的30%（简化估算）
-        receivables = balance.get('流动资产')
+        receivables = current_assets
         if receivables is not None:
             receivables = receivables * 0.3
-        receivables_turnover = self._safe_divide(income.get('营业收入'), receivables)
+        receivables_turnover = self._safe_divide(revenue, receivables)
         
         # 存货周转率 = 营业成本 / 存货
         # 假设存货约为流动资产的20%（简化估算）
-        inventory = balance.get('流动资产')
+        inventory = current_assets
         if inventory is not None:
             inventory = inventory * 0.2
         inventory_turnover = self._safe_divide(income.get('营业成本'), inventory)
         
         # 总资产周转率 = 营业收入 / 总资产
-        total_asset_turnover = self._safe_divide(
-            income.get('营业收入'),
-            balance.get('总资产')
-        )
+        total_asset_turnover = self._safe_divide(revenue, balance.get('总资产'))
         
         return {
             '应收账款周转率': receivables_turnover,
@@ -224,17 +219,40 @@ class IndicatorCalculator:
         Returns:
             Dict: {年份: {维度: {指标: 值}}}
         """
-        result = {}
-        
-        for year in self.years:
-            result[year] = {
+        return {
+            year: {
                 '盈利风险': self.calculate_profitability_indicators(year),
                 '偿债风险': self.calculate_solvency_indicators(year),
                 '运营风险': self.calculate_operation_indicators(year),
                 '现金流风险': self.calculate_cashflow_indicators(year)
             }
+            for year in self.years
+        }
+    
+    @staticmethod
+    def to_series(all_indicators: Dict[int, Dict[str, Dict[str, Optional[float]]]],
+                  years: List[int]) -> Dict[str, Dict[str, List[Optional[float]]]]:
+        """
+        将按年份组织的指标转换为按维度、指标组织的年度数值序列
         
-        return result
+        Args:
+            all_indicators: {年份: {维度: {指标: 值}}}
+            years: 年份顺序
+            
+        Returns:
+            Dict: {维度: {指标: [各年份的值]}}，某年份缺少该指标时取0
+        """
+        series = {}
+        for index, year in enumerate(years):
+            for dimension, indicators in all_indicators.get(year, {}).items():
+                if not isinstance(indicators, dict):
+                    continue
+                dimension_series = series.setdefault(dimension, {})
+                for name, value in indicators.items():
+                    if name not in dimension_series:
+                        dimension_series[name] = [0] * len(years)
+                    dimension_series[name][index] = value
+        return series
     
     def format_indicator_value(self, value: Optional[float], unit: str = '') -> str:
         """
@@ -6,15 +6,91 @@ PDF导出模块 - 基于HTML模板
 from weasyprint import HTML, CSS
 from flask import render_template
 import os
+import logging
 from typing import Dict
 import tempfile
 
+logger = logging.getLogger(__name__)
+
+
+# 自定义CSS（用于PDF打印优化），模块加载时定义，导出器初始化时解析一次
+PDF_PRINT_CSS = '''
+    @page {
+        size: A4;
+        margin: 2.2cm 1.8cm;
+    }
+    
+    @page :first {
+        margin: 0;
+    }
+    
+    body {
+        font-size: 10.5pt;
+        font-family: 'Microsoft YaHei', 'PingFang SC', 'SimHei', sans-serif;
+    }
+    
+    /* 表格优化 - 避免跨页断开 */
+    table {
+        page-break-inside: avoid;
+    }
+    
+    thead {
+        display: table-header-group;
+    }
+    
+    tr {
+        page-break-inside: avoid;
+        page-break-after: auto;
+    }
+    
+    /* 标题避免孤立 */
+    h1, h2, h3, h4, h5 {
+        page-break-after: avoid;
+        page-break-inside: avoid;
+    }
+    
+    /* 图表容器不跨页 */
+    .chart-container {
+        page-break-inside: avoid;
+        page-break-before: auto;
+    }
+    
+    /* 模块分页控制 - 每个模块新起一页 */
+    .report-card {
+        page-break-before: always;
+        page-break-inside: avoid;
+    }
+    
+    .overall-assessment {
+        page-break-before: always;
+        page-break-inside: avoid;
+    }
+    
+    /* 维度卡片分页控制 - 每个维度新起一页 */
+    .dimension-card {
+        page-break-before: always;
+        page-break-inside: avoid;
+    }
+    
+    /* 分析文本优化 */
+    .analysis-text {
+        page-break-inside: avoid;
+        orphans: 3;
+        widows: 3;
+    }
+'''
+
+
 class PDFExporter:
     """PDF导出器 - 基于HTML模板，优化PDF输出质量"""
     
     def __init__(self):
-        """初始化PDF导出器"""
-        pass
+        """初始化PDF导出器（打印样式表与封面图片路径只需准备一次，导出器在进程内共享）"""
+        self.pdf_css = CSS(string=PDF_PRINT_CSS)
+        
+        # 获取项目根目录的绝对路径
+        current_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        self.cover_image_path = os.path.join(current_dir, 'static', 'image', 'tupian.png')
     
     def export_to_pdf(self, report_data: Dict, output_path: str) -> bool:
         """
@@ -28,98 +104,24 @@ class PDFExporter:
             bool: 是否成功
         """
         try:
-            # 获取项目根目录的绝对路径
-            import os
-            current_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-            cover_image_path = os.path.join(current_dir, 'static', 'image', 'tupian.png')
-            
-            # 将封面图片路径添加到报告数据中
-            report_data['cover_image_path'] = cover_image_path
+            # 将封面图片路径添加到报告数据的副本中，不修改调用方的数据
+            report_data = dict(report_data, cover_image_path=self.cover_image_path)
             
             # 渲染HTML模板
             html_content = render_template('report_pdf.html', report=report_data)
             
-            # 自定义CSS（用于PDF打印优化）
-            pdf_css = CSS(string='''
-                @page {
-                    size: A4;
-                    margin: 2.2cm 1.8cm;
-                }
-                
-                @page :first {
-                    margin: 0;
-                }
-                
-                body {
-                    font-size: 10.5pt;
-                    font-family: 'Microsoft YaHei', 'PingFang SC', 'SimHei', sans-serif;
-                }
-                
-                /* 表格优化 - 避免跨页断开 */
-                table {
-                    page-break-inside: avoid;
-                }
-                
-                thead {
-                    display: table-header-group;
-                }
-                
-                tr {
-                    page-break-inside: avoid;
-                    page-break-after: auto;
-                }
-                
-                /* 标题避免孤立 */
-                h1, h2, h3, h4, h5 {
-                    page-break-after: avoid;
-                    page-break-inside: avoid;
-                }
-                
-                /* 图表容器不跨页 */
-                .chart-container {
-                    page-break-inside: avoid;
-                    page-break-before: auto;
-                }
-                
-                /* 模块分页控制 - 每个模块新起一页 */
-                .report-card {
-                    page-break-before: always;
-                    page-break-inside: avoid;
-                }
-                
-                .overall-assessment {
-                    page-break-before: always;
-                    page-break-inside: avoid;
-                }
-                
-                /* 维度卡片分页控制 - 每个维度新起一页 */
-                .dimension-card {
-                    page-break-before: always;
-                    page-break-inside: avoid;
-                }
-                
-                /* 分析文本优化 */
-                .analysis-text {
-                    page-break-inside: avoid;
-                    orphans: 3;
-                    widows: 3;
-                }
-            ''')
-            
             # 生成PDF - 优化渲染参数
             HTML(string=html_content).write_pdf(
                 output_path,
-                stylesheets=[pdf_css],
+                stylesheets=[self.pdf_css],
                 presentational_hints=True,
                 optimize_images=True
             )
             
             return True
             
-        except Exception as e:
-            print(f"PDF导出失败: {str(e)}")
-            import traceback
-            traceback.print_exc()
+        except Exception:
+            logger.exception('PDF导出失败: %s', output_path)
             return False
     
     def export_to_pdf_alt(self, report_data: Dict, output_path: str) -> bool:
@@ -162,10 +164,8 @@ class PDFExporter:
         except ImportError:
             print("pdfkit 未安装，使用 WeasyPrint")
             return self.export_to_pdf(report_data, output_path)
-        except Exception as e:
-            print(f"PDF导出失败: {str(e)}")
-            import traceback
-            traceback.print_exc()
+        except Exception:
+            logger.exception('PDF导出失败: %s', output_path)
             return False
     
     @staticmethod
@@ -4,7 +4,8 @@
 """
 
 from typing import Dict, List, Optional
-from datetime import datetime
+import time
+from concurrent.futures import ThreadPoolExecutor
 from .data_processor import DataProcessor
 from .indicator_calculator import IndicatorCalculator
 from .ai_analyzer import AIAnalyzer
@@ -20,11 +21,10 @@ class ReportGenerator:
         Args:
             ai_model: 指定使用的AI模型，如果为None则使用配置文件中的默认模型
         """
-        self.data_processor = None
-        self.indicator_calculator = None
+        # 实例只持有无状态的分析器/图表生成器，单次生成的中间数据都是局部变量，
+        # 因此同一实例可以在多个线程中同时生成报告
         self.ai_analyzer = AIAnalyzer(model=ai_model)
         self.chart_generator = ChartGenerator()
-        self.report_data = {}
     
     def generate_report(self, excel_path: str) -> Dict:
         """
@@ -37,43 +37,46 @@ class ReportGenerator:
             Dict: 报告数据字典
         """
         # 1. 加载和验证数据
-        self.data_processor = DataProcessor()
-        if not self.data_processor.load_excel(excel_path):
+        data_processor = DataProcessor()
+        if not data_processor.load_excel(excel_path):
             return {"error": "数据加载失败"}
         
-        is_valid, errors = self.data_processor.validate_data()
+        is_valid, errors = data_processor.validate_data()
         if not is_valid:
             return {"error": f"数据验证失败: {', '.join(errors)}"}
         
         # 2. 提取基本信息
-        basic_info = self.data_processor.get_basic_info()
+        basic_info = data_processor.get_basic_info()
         
         # 3. 获取财务数据
-        financial_data = self.data_processor.get_two_year_financial_data()
-        years = self.data_processor.get_years()
+        financial_data = data_processor.get_two_year_financial_data()
+        years = data_processor.get_years()
         
         # 4. 计算财务指标
-        self.indicator_calculator = IndicatorCalculator(financial_data)
-        all_indicators = self.indicator_calculator.calculate_all_indicators()
+        all_indicators = IndicatorCalculator(financial_data).calculate_all_indicators()
         
-        # 5. 生成各维度AI分析
-        dimension_analyses = {}
+        # 5. 生成各维度AI分析（各维度的AI请求相互独立，并发发起）
         dimensions = ['盈利风险', '偿债风险', '运营风险', '现金流风险']
-        
-        for dimension in dimensions:
-            current_year = years[0] if years else 2023
-            indicators = all_indicators.get(current_year, {}).get(dimension, {})
-            
-            # 准备两年的数据用于趋势分析
-            year_data = {}
-            for year in years:
-                year_data[year] = all_indicators.get(year, {}).get(dimension, {})
+        current_year = years[0] if years else 2023
+        
+        with ThreadPoolExecutor(max_workers=len(dimensions)) as executor:
+            futures = {}
+            for dimension in dimensions:
+                indicators = all_indicators.get(current_year, {}).get(dimension, {})
+                
+                # 准备两年的数据用于趋势分析
+                year_data = {}
+                for year in years:
+                    year_data[year] = all_indicators.get(year, {}).get(dimension, {})
+                
+                # 生成AI分析
+                futures[dimension] = executor.submit(
+                    self.ai_analyzer.analyze_dimension_risk,
+                    dimension, indicators, year_data, basic_info
+                )
             
-            # 生成AI分析
-            analysis = self.ai_analyzer.analyze_dimension_risk(
-                dimension, indicators, year_data, basic_info
-            )
-            dimension_analyses[dimension] = analysis
+            # 按维度顺序收集结果，保持报告中的维度顺序不变
+            dimension_analyses = {dimension: future.result() for dimension, future in futures.items()}
         
         # 6. 生成总体风险评估
         overall_assessment = self.ai_analyzer.generate_overall_risk_assessment(
@@ -105,8 +108,8 @@ class ReportGenerator:
         overall_assessment_pdf = self.ai_analyzer.format_for_pdf(overall_assessment)
         
         # 9. 组装报告数据
-        self.report_data = {
-            'generated_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        return {
+            'generated_at': time.strftime('%Y-%m-%d %H:%M:%S'),
             'basic_info': basic_info,
             'years': years,
             'financial_data': financial_data,
@@ -118,12 +121,6 @@ class ReportGenerator:
             'validation_errors': errors if errors else [],
             'charts': charts  # 添加图表数据
         }
-        
-        return self.report_data
-    
-    def get_report_data(self) -> Dict:
-        """获取当前报告数据"""
-        return self.report_data
     
     def format_number(self, value: Optional[float], decimal_places: int = 2) -> str:
         """
@@ -4,10 +4,57 @@
 """
 
 import pandas as pd
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
 from typing import Dict, List, Optional, Tuple
 from datetime import datetime
 
 
+class TTLCache:
+    """带过期时间的LRU缓存（线程安全）"""
+    
+    def __init__(self, maxsize: int = 128, ttl: float = 60):
+        """
+        初始化缓存
+        
+        Args:
+            maxsize: 最大条目数，超出时淘汰最久未使用的条目
+            ttl: 条目有效期（秒）
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get(self, key, default=None):
+        """读取未过期的缓存值"""
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return default
+            value, expires_at = item
+            if time.monotonic() >= expires_at:
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+    
+    def set(self, key, value):
+        """写入缓存值"""
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + self.ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+    
+    def clear(self):
+        """清空缓存"""
+        with self._lock:
+            self._data.clear()
+
+
 class TaxDataAdapter:
     """财税票数据适配器"""
     
@@ -41,14 +88,185 @@ class TaxDataAdapter:
         '现金及现金等价物净增加额': '现金及现金等价物净增加额',
     }
     
-    def __init__(self, db_connection=None):
+    # 报表名称 -> 项目名称映射
+    STATEMENT_MAPPINGS = {
+        '资产负债表': BALANCE_SHEET_MAPPING,
+        '利润表': PROFIT_MAPPING,
+        '现金流量表': CASHFLOW_MAPPING,
+    }
+    
+    # 反向映射（数据库项目名称 -> 标准名称），类定义时构建一次，逐行查找为O(1)
+    REVERSE_MAPPINGS = {
+        sheet: {v: k for k, v in mapping.items()}
+        for sheet, mapping in STATEMENT_MAPPINGS.items()
+    }
+    
+    # 各报表需要查询的数据库项目名称（用于SQL的IN过滤）
+    STATEMENT_PROJECT_NAMES = {
+        sheet: tuple(mapping.values())
+        for sheet, mapping in STATEMENT_MAPPINGS.items()
+    }
+    
+    # 企业基础信息查询（WHERE条件由调用方拼接，必须带参数执行，因此DATE_FORMAT中的%需转义）
+    # 成立日期的格式化在SQL中完成；注册资本CAST为DECIMAL（旧版MySQL/MariaDB不支持CAST AS DOUBLE），
+    # 由_format_basic_info转为float
+    BASIC_INFO_SQL = """
+        SELECT 
+            taxpayer_name AS 企业名称,
+            taxpayer_id AS 统一社会信用代码,
+            CAST(register_capital AS DECIMAL(20,4)) AS 注册资本,
+            DATE_FORMAT(COALESCE(registered_date, start_business_date), '%%Y-%%m-%%d') AS 成立日期,
+            industry_type AS 行业类别,
+            legal_person_name AS 法定代表人,
+            -- 额外字段
+            hydm AS 行业代码,
+            register_province AS 登记省份,
+            register_city AS 登记城市,
+            register_county AS 登记区域,
+            employees_number AS 从业人数,
+            taxpayer_type AS 纳税人资格类型,
+            business_scope AS 经营范围
+        FROM syx_enterprise_info
+        """
+    
+    def __init__(self, db_connection=None, db_pool=None, cache_ttl: float = 60):
         """
         初始化适配器
         
         Args:
             db_connection: 数据库连接对象（如果使用数据库）
+            db_pool: 数据库连接池，提供时每次加载从池中借用连接，用完归还
+            cache_ttl: 查询结果缓存有效期（秒），0表示不缓存
         """
         self.db_connection = db_connection
+        self.db_pool = db_pool
+        # 财税数据很少变化，短期缓存查询结果，重复加载同一企业时无需访问数据库
+        self._query_cache = TTLCache(maxsize=256, ttl=cache_ttl) if cache_ttl > 0 else None
+    
+    @staticmethod
+    def create_pool(db_config: Dict, pool_size: int = 10, pool_name: str = 'aifi',
+                    reset_session: bool = False):
+        """
+        创建MySQL连接池，避免每次查询都重新建立TCP连接和认证
+        
+        Args:
+            db_config: 数据库连接配置
+            pool_size: 连接池大小
+            pool_name: 连接池名称
+            reset_session: 连接归还时是否重置会话。适配器只执行只读查询、不设置会话变量，
+                默认关闭以省去每次归还时的一次往返
+            
+        Returns:
+            MySQLConnectionPool: 连接池对象
+        """
+        import mysql.connector.pooling
+        
+        # 只读查询开启autocommit，省去提交的往返
+        return mysql.connector.pooling.MySQLConnectionPool(
+            pool_name=pool_name,
+            pool_size=pool_size,
+            pool_reset_session=reset_session,
+            autocommit=True,
+            **db_config
+        )
+    
+    def clear_cache(self):
+        """清空查询结果缓存（数据库数据更新后调用）"""
+        if self._query_cache is not None:
+            self._query_cache.clear()
+    
+    def _fetch_all(self, conn, sql: str, params: Tuple, dictionary: bool = False) -> List:
+        """
+        执行查询并返回全部结果，命中缓存时不访问数据库
+        
+        Args:
+            conn: 数据库连接
+            sql: SQL语句
+            params: 查询参数
+            dictionary: 是否以字典形式返回行
+            
+        Returns:
+            List: 查询结果行（调用方不应修改）
+        """
+        key = (sql, params, dictionary)
+        if self._query_cache is not None:
+            rows = self._query_cache.get(key)
+            if rows is not None:
+                return rows
+        
+        cursor = conn.cursor(dictionary=True) if dictionary else conn.cursor()
+        try:
+            cursor.execute(sql, params)
+            rows = cursor.fetchall()
+        finally:
+            cursor.close()
+        
+        if self._query_cache is not None:
+            self._query_cache.set(key, rows)
+        return rows
+    
+    def _iter_rows(self, conn, sql: str, params: Tuple, dictionary: bool = False):
+        """
+        逐行迭代查询结果
+        
+        启用缓存时复用_fetch_all的结果；未启用缓存时使用非缓冲游标边读边处理，
+        不在内存中物化完整结果集。调用方需在同一连接上执行下一条查询前迭代完所有行。
+        
+        Args:
+            conn: 数据库连接
+            sql: SQL语句
+            params: 查询参数
+            dictionary: 是否以字典形式返回行
+            
+        Yields:
+            查询结果行
+        """
+        if self._query_cache is not None:
+            yield from self._fetch_all(conn, sql, params, dictionary)
+            return
+        
+        cursor = conn.cursor(dictionary=dictionary, buffered=False)
+        try:
+            cursor.execute(sql, params)
+            yield from cursor
+        finally:
+            cursor.close()
+    
+    def _get_pooled_connection(self, timeout: float = 5.0):
+        """
+        从连接池借用连接，连接池暂时耗尽时短暂等待而不是立即报错
+        
+        Args:
+            timeout: 最长等待时间（秒）
+            
+        Returns:
+            池化的数据库连接
+        """
+        from mysql.connector.errors import PoolError
+        
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                return self.db_pool.get_connection()
+            except PoolError:
+                if time.monotonic() >= deadline:
+                    raise
+                time.sleep(0.05)
+    
+    @contextmanager
+    def _connection(self):
+        """获取数据库连接：优先从连接池借用，用完后归还"""
+        if self.db_pool is not None:
+            conn = self._get_pooled_connection()
+            try:
+                yield conn
+            finally:
+                # 池化连接的close()会将连接归还连接池
+                conn.close()
+        elif self.db_connection is not None:
+            yield self.db_connection
+        else:
+            raise Exception("未配置数据库连接")
     
     def load_from_database(self, taxpayer_id: str, years: List[int] = None) -> Dict:
         """
@@ -66,230 +284,163 @@ class TaxDataAdapter:
             years = [current_year - 1, current_year - 2]  # 默认最近两年
         
         try:
-            # 1. 加载基本信息
-            basic_info = self._load_basic_info(taxpayer_id)
-            
-            # 2. 加载财务数据
-            financial_data = {}
-            for year in years:
-                financial_data[year] = {
-                    '资产负债表': self._load_balance_sheet(taxpayer_id, year),
-                    '利润表': self._load_profit_statement(taxpayer_id, year),
-                    '现金流量表': self._load_cashflow_statement(taxpayer_id, year)
-                }
-            
-            return {
-                'basic_info': basic_info,
-                'financial_data': financial_data,
-                'years': sorted(years, reverse=True)
-            }
+            with self._connection() as conn:
+                # 1. 加载基本信息
+                basic_info = self._load_basic_info(conn, taxpayer_id)
+                
+                # 2. 加载财务数据（三张报表、所有年份一次查询）
+                financial_data = self._load_financial_statements(conn, taxpayer_id, years)
             
         except Exception as e:
             raise Exception(f"从数据库加载数据失败: {str(e)}")
+        
+        return {
+            'basic_info': basic_info,
+            'financial_data': financial_data,
+            'years': sorted(years, reverse=True)
+        }
     
-    def _load_basic_info(self, taxpayer_id: str) -> Dict[str, any]:
+    def _load_basic_info(self, conn, taxpayer_id: str) -> Dict[str, any]:
         """
         加载企业基础信息
         
         Args:
+            conn: 数据库连接
             taxpayer_id: 纳税人识别号
             
         Returns:
             Dict: 企业基本信息
         """
-        if self.db_connection is None:
-            raise Exception("未配置数据库连接")
-        
-        # SQL查询
-        sql = """
-        SELECT 
-            taxpayer_name AS 企业名称,
-            taxpayer_id AS 统一社会信用代码,
-            register_capital AS 注册资本,
-            COALESCE(registered_date, start_business_date) AS 成立日期,
-            industry_type AS 行业类别,
-            legal_person_name AS 法定代表人,
-            -- 额外字段
-            hydm AS 行业代码,
-            register_province AS 登记省份,
-            register_city AS 登记城市,
-            register_county AS 登记区域,
-            employees_number AS 从业人数,
-            taxpayer_type AS 纳税人资格类型,
-            business_scope AS 经营范围
-        FROM syx_enterprise_info
+        sql = self.BASIC_INFO_SQL + """
         WHERE taxpayer_id = %s
         LIMIT 1
         """
         
-        cursor = self.db_connection.cursor(dictionary=True)
-        cursor.execute(sql, (taxpayer_id,))
-        result = cursor.fetchone()
-        cursor.close()
+        rows = self._fetch_all(conn, sql, (taxpayer_id,), dictionary=True)
         
-        if result is None:
+        if not rows:
             raise Exception(f"未找到纳税人识别号为 {taxpayer_id} 的企业信息")
         
-        # 处理注册资本单位（转换为万元）
-        if result.get('注册资本'):
-            result['注册资本（万元）'] = float(result['注册资本'])
-            del result['注册资本']
-        
-        # 处理日期格式
-        if result.get('成立日期'):
-            result['成立日期'] = result['成立日期'].strftime('%Y-%m-%d')
-        
-        # 处理None值
-        for key, value in result.items():
-            if value is None:
-                result[key] = "【数据缺失】"
-        
-        return result
+        return self._format_basic_info(rows[0])
     
-    def _load_balance_sheet(self, taxpayer_id: str, year: int) -> Dict[str, float]:
+    def load_basic_info_batch(self, taxpayer_ids: List[str]) -> Dict[str, Dict]:
         """
-        加载资产负债表数据
+        批量加载多家企业的基础信息（一次IN查询，避免逐个查询的N+1往返）
         
         Args:
-            taxpayer_id: 纳税人识别号
-            year: 年份
+            taxpayer_ids: 纳税人识别号列表
             
         Returns:
-            Dict: 资产负债表数据
+            Dict: {纳税人识别号: 企业基本信息}，数据库中不存在的企业不包含在结果中
         """
-        if self.db_connection is None:
-            raise Exception("未配置数据库连接")
+        ids = tuple(dict.fromkeys(taxpayer_ids))
+        if not ids:
+            return {}
         
-        # SQL查询：获取指定年度的资产负债表数据
-        sql = """
-        SELECT 
-            project_name,
-            ending_balance
-        FROM syx_tax_finance_balance_year
-        WHERE taxpayer_id = %s
-          AND YEAR(end_date) = %s
-          AND (invalid_mark IS NULL OR invalid_mark = '')
-        ORDER BY sequence
+        placeholders = ','.join(['%s'] * len(ids))
+        sql = self.BASIC_INFO_SQL + f"""
+        WHERE taxpayer_id IN ({placeholders})
         """
         
-        cursor = self.db_connection.cursor()
-        cursor.execute(sql, (taxpayer_id, year))
-        results = cursor.fetchall()
-        cursor.close()
-        
-        # 转换为字典
-        data = {}
-        reverse_mapping = {v: k for k, v in self.BALANCE_SHEET_MAPPING.items()}
-        
-        for row in results:
-            project_name, value = row
-            # 查找映射
-            standard_name = reverse_mapping.get(project_name)
-            if standard_name:
-                data[standard_name] = float(value) if value is not None else None
-        
-        # 确保所有必需字段都存在
-        for standard_name in self.BALANCE_SHEET_MAPPING.keys():
-            if standard_name not in data:
-                data[standard_name] = None
-        
-        return data
+        info_map = {}
+        with self._connection() as conn:
+            for row in self._iter_rows(conn, sql, ids, dictionary=True):
+                info_map.setdefault(row['统一社会信用代码'], self._format_basic_info(row))
+        return info_map
     
-    def _load_profit_statement(self, taxpayer_id: str, year: int) -> Dict[str, float]:
+    @staticmethod
+    def _format_basic_info(row: Dict) -> Dict[str, any]:
         """
-        加载利润表数据
+        整理企业基础信息查询结果的单位、日期和缺失值
         
         Args:
-            taxpayer_id: 纳税人识别号
-            year: 年份
+            row: 查询结果行
             
         Returns:
-            Dict: 利润表数据
-        """
-        if self.db_connection is None:
-            raise Exception("未配置数据库连接")
-        
-        # SQL查询
-        sql = """
-        SELECT 
-            project_name,
-            current_year_accumulative_amount
-        FROM syx_tax_finance_profit_year
-        WHERE taxpayer_id = %s
-          AND YEAR(end_date) = %s
-          AND (invalid_mark IS NULL OR invalid_mark = '')
-        ORDER BY sequence
+            Dict: 企业基本信息
         """
-        
-        cursor = self.db_connection.cursor()
-        cursor.execute(sql, (taxpayer_id, year))
-        results = cursor.fetchall()
-        cursor.close()
-        
-        # 转换为字典
-        data = {}
-        reverse_mapping = {v: k for k, v in self.PROFIT_MAPPING.items()}
-        
-        for row in results:
-            project_name, value = row
-            standard_name = reverse_mapping.get(project_name)
-            if standard_name:
-                data[standard_name] = float(value) if value is not None else None
-        
-        # 确保所有必需字段都存在
-        for standard_name in self.PROFIT_MAPPING.keys():
-            if standard_name not in data:
-                data[standard_name] = None
-        
-        return data
+        missing = "【数据缺失】"
+        
+        # 单次遍历构建新字典（不修改缓存中的结果）：处理None值，注册资本单位为万元
+        capital = row.get('注册资本')
+        capital_key = '注册资本（万元）' if capital else '注册资本'
+        info = {
+            (capital_key if key == '注册资本' else key): (missing if value is None else value)
+            for key, value in row.items()
+        }
+        if capital is not None:
+            info[capital_key] = float(capital)
+        return info
     
-    def _load_cashflow_statement(self, taxpayer_id: str, year: int) -> Dict[str, float]:
+    def _load_financial_statements(self, conn, taxpayer_id: str, years: List[int]) -> Dict[int, Dict]:
         """
-        加载现金流量表数据
+        加载资产负债表、利润表、现金流量表数据
+        
+        三张报表通过UNION ALL合并为一次查询，按sheet列分发到各年度报表，
+        避免每个年度每张报表各自一次数据库往返。
         
         Args:
+            conn: 数据库连接
             taxpayer_id: 纳税人识别号
-            year: 年份
+            years: 年份列表
             
         Returns:
-            Dict: 现金流量表数据
+            Dict: {年份: {'资产负债表': {...}, '利润表': {...}, '现金流量表': {...}}}
         """
-        if self.db_connection is None:
-            raise Exception("未配置数据库连接")
-        
-        # SQL查询
-        sql = """
-        SELECT 
-            project_name,
-            bnljje
-        FROM syx_cash_flow
+        years = tuple(years)
+        year_placeholders = ','.join(['%s'] * len(years))
+        # 日期范围条件可使用(taxpayer_id, end_date)索引，YEAR() IN再精确筛选所需年份
+        date_range = (f"{min(years)}-01-01", f"{max(years) + 1}-01-01")
+        
+        def condition(sheet):
+            # 只取映射中需要的项目，减少返回行数
+            names = self.STATEMENT_PROJECT_NAMES[sheet]
+            name_placeholders = ','.join(['%s'] * len(names))
+            return f"""
         WHERE taxpayer_id = %s
-          AND YEAR(end_date) = %s
+          AND end_date >= %s AND end_date < %s
+          AND YEAR(end_date) IN ({year_placeholders})
+          AND project_name IN ({name_placeholders})
           AND (invalid_mark IS NULL OR invalid_mark = '')
-        ORDER BY sequence
         """
         
-        cursor = self.db_connection.cursor()
-        cursor.execute(sql, (taxpayer_id, year))
-        results = cursor.fetchall()
-        cursor.close()
-        
-        # 转换为字典
-        data = {}
-        reverse_mapping = {v: k for k, v in self.CASHFLOW_MAPPING.items()}
-        
-        for row in results:
-            project_name, value = row
-            standard_name = reverse_mapping.get(project_name)
-            if standard_name:
-                data[standard_name] = float(value) if value is not None else None
+        # SQL查询：sequence用于保持原有的项目顺序
+        sql = f"""
+        SELECT '资产负债表' AS sheet, YEAR(end_date) AS year, project_name, ending_balance AS value, sequence
+        FROM syx_tax_finance_balance_year
+        {condition('资产负债表')}
+        UNION ALL
+        SELECT '利润表', YEAR(end_date), project_name, current_year_accumulative_amount, sequence
+        FROM syx_tax_finance_profit_year
+        {condition('利润表')}
+        UNION ALL
+        SELECT '现金流量表', YEAR(end_date), project_name, bnljje, sequence
+        FROM syx_cash_flow
+        {condition('现金流量表')}
+        ORDER BY sequence
+        """
+        params = tuple(
+            param
+            for sheet in ('资产负债表', '利润表', '现金流量表')
+            for param in (taxpayer_id, *date_range, *years, *self.STATEMENT_PROJECT_NAMES[sheet])
+        )
         
         # 确保所有必需字段都存在
-        for standard_name in self.CASHFLOW_MAPPING.keys():
-            if standard_name not in data:
-                data[standard_name] = None
+        financial_data = {
+            year: {
+                sheet: dict.fromkeys(mapping.keys())
+                for sheet, mapping in self.STATEMENT_MAPPINGS.items()
+            }
+            for year in years
+        }
+        
+        reverse_mappings = self.REVERSE_MAPPINGS
+        for sheet, year, project_name, value, _ in self._iter_rows(conn, sql, params):
+            standard_name = reverse_mappings[sheet].get(project_name)
+            if standard_name and year in financial_data:
+                financial_data[year][sheet][standard_name] = float(value) if value is not None else None
         
-        return data
+        return financial_data
     
     def export_to_excel_template(self, taxpayer_id: str, output_path: str, years: List[int] = None):
         """
@@ -339,9 +490,6 @@ class TaxDataAdapter:
         
         这个方法会在数据库中创建视图，将窄表转换为宽表格式
         """
-        if self.db_connection is None:
-            raise Exception("未配置数据库连接")
-        
         # 资产负债表视图
         balance_view_sql = """
         CREATE OR REPLACE VIEW v_balance_sheet_wide AS
@@ -396,23 +544,24 @@ class TaxDataAdapter:
         GROUP BY taxpayer_id, YEAR(end_date), period
         """
         
-        cursor = self.db_connection.cursor()
-        try:
-            cursor.execute(balance_view_sql)
-            print("✓ 资产负债表视图创建成功")
-            
-            cursor.execute(profit_view_sql)
-            print("✓ 利润表视图创建成功")
-            
-            cursor.execute(cashflow_view_sql)
-            print("✓ 现金流量表视图创建成功")
-            
-            self.db_connection.commit()
-        except Exception as e:
-            self.db_connection.rollback()
-            raise Exception(f"创建视图失败: {str(e)}")
-        finally:
-            cursor.close()
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            try:
+                cursor.execute(balance_view_sql)
+                print("✓ 资产负债表视图创建成功")
+                
+                cursor.execute(profit_view_sql)
+                print("✓ 利润表视图创建成功")
+                
+                cursor.execute(cashflow_view_sql)
+                print("✓ 现金流量表视图创建成功")
+                
+                conn.commit()
+            except Exception as e:
+                conn.rollback()
+                raise Exception(f"创建视图失败: {str(e)}")
+            finally:
+                cursor.close()
 
 
 # 使用示例
@@ -422,8 +571,6 @@ if __name__ == "__main__":
     """
     # 方式1: 连接数据库并导出Excel
     try:
-        import mysql.connector
-        
         # 配置数据库连接
         db_config = {
             'host': 'localhost',
@@ -432,11 +579,11 @@ if __name__ == "__main__":
             'database': 'your_database'
         }
         
-        # 创建连接
-        connection = mysql.connector.connect(**db_config)
+        # 创建连接池（进程内创建一次，之后每次加载借用连接）
+        pool = TaxDataAdapter.create_pool(db_config)
         
         # 创建适配器
-        adapter = TaxDataAdapter(db_connection=connection)
+        adapter = TaxDataAdapter(db_pool=pool)
         
         # 导出企业数据
         taxpayer_id = '91XXXXXXXXXXXXXXXX'
@@ -446,9 +593,6 @@ if __name__ == "__main__":
             years=[2023, 2022]
         )
         
-        # 关闭连接
-        connection.close()
-        
     except Exception as e:
         print(f"错误: {str(e)}")
     
@@ -1,10 +1,17 @@
 """重置用户密码"""
 from werkzeug.security import generate_password_hash
-import json
+import orjson
+
+try:
+    # 与app.py相同：安装了argon2-cffi时使用argon2，否则使用Werkzeug默认算法
+    from argon2 import PasswordHasher
+    hash_password = PasswordHasher(time_cost=2, memory_cost=19456, parallelism=1).hash
+except ImportError:
+    hash_password = generate_password_hash
 
 # 生成新密码哈希
-admin_password = generate_password_hash('admin123')
-user_password = generate_password_hash('user123')
+admin_password = hash_password('admin123')
+user_password = hash_password('user123')
 
 users = {
     "admin": {
@@ -28,8 +35,8 @@ users = {
 }
 
 # 保存
-with open('data/users.json', 'w', encoding='utf-8') as f:
-    json.dump(users, f, ensure_ascii=False, indent=2)
+with open('data/users.json', 'wb') as f:
+    f.write(orjson.dumps(users, option=orjson.OPT_INDENT_2))
 
 print("密码已重置！")
 print("admin/admin123")
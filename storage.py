@@ -0,0 +1,94 @@
+"""
+报告存储
+报告文件的路径、序列化与原子写入，供Web应用和离线维护脚本共用（不依赖Flask）
+"""
+
+import os
+import gzip
+
+import orjson
+
+from config import Config
+
+# 报告持久化存储：每个报告一个文件，新增/删除报告只需写入单个文件
+REPORTS_DIR = os.path.join(Config.DATA_FOLDER, 'reports')
+# 旧版单文件存储，仅在首次启动迁移时读取
+REPORTS_STORAGE_FILE = os.path.join(Config.DATA_FOLDER, 'reports_storage.json')
+
+# 报告文件后缀：未压缩 / gzip压缩（由 Config.REPORTS_GZIP_LEVEL 决定写入哪种，两种都可读取）
+REPORT_FILE_SUFFIX = '.json'
+REPORT_GZIP_SUFFIX = '.json.gz'
+
+# orjson序列化选项：原生处理numpy类型，允许年份等非字符串键
+# 存储文件只由程序读写，不做缩进以减小体积；需要人工查看时使用 /api/admin/dump_reports?pretty=1
+ORJSON_OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+
+def json_default(obj):
+    """orjson无法原生序列化的类型（如Decimal、complex、日期）回退处理"""
+    if hasattr(obj, 'tolist'):
+        return obj.tolist()
+    return str(obj)
+
+
+def write_file_atomic(path, data):
+    """先写入临时文件再替换目标文件，写入中途异常退出也不会留下损坏的数据文件"""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+        # 替换前确保内容已落盘，系统崩溃或断电后不会出现替换成功但内容为空的文件
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def remove_file(path):
+    """删除文件，文件不存在时忽略"""
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def report_id_from_filename(name):
+    """从报告文件名取出报告ID，不是报告文件时返回None"""
+    for suffix in (REPORT_FILE_SUFFIX, REPORT_GZIP_SUFFIX):
+        if name.endswith(suffix):
+            return name[:-len(suffix)]
+    return None
+
+
+def get_report_path(report_id, compressed=False, directory=REPORTS_DIR):
+    """报告存储文件路径"""
+    suffix = REPORT_GZIP_SUFFIX if compressed else REPORT_FILE_SUFFIX
+    return os.path.join(directory, f"{report_id}{suffix}")
+
+
+def read_report_file(name, directory=REPORTS_DIR):
+    """读取并解析单个报告文件，失败时返回None"""
+    try:
+        with open(os.path.join(directory, name), 'rb') as f:
+            data = f.read()
+        if name.endswith(REPORT_GZIP_SUFFIX):
+            data = gzip.decompress(data)
+        return orjson.loads(data)
+    except Exception as e:
+        print(f"✗ 加载报告 {name} 失败: {str(e)}")
+        return None
+
+
+def encode_report(report):
+    """序列化报告，配置了REPORTS_GZIP_LEVEL时gzip压缩"""
+    data = orjson.dumps(report, default=json_default, option=ORJSON_OPTIONS)
+    if Config.REPORTS_GZIP_LEVEL:
+        # 报告中大量重复的键名压缩率很高；mtime固定为0，相同内容得到相同文件
+        data = gzip.compress(data, compresslevel=Config.REPORTS_GZIP_LEVEL, mtime=0)
+    return data
+
+
+def write_report_file(report_id, report, directory=REPORTS_DIR):
+    """按当前压缩设置原子写入单个报告文件"""
+    compressed = bool(Config.REPORTS_GZIP_LEVEL)
+    write_file_atomic(get_report_path(report_id, compressed, directory), encode_report(report))
+    # 切换压缩设置后删除另一种格式的旧文件，避免加载时重复
+    remove_file(get_report_path(report_id, not compressed, directory))
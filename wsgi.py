@@ -0,0 +1,27 @@
+"""
+WSGI入口
+生产环境使用gunicorn运行：
+
+    gunicorn -w 1 -k gthread --threads 16 -b 0.0.0.0:5000 wsgi:app
+
+报告、导出任务状态等数据保存在进程内存中，轮询接口依赖同一进程，
+因此只使用单个worker，通过多线程提供并发。
+
+放在nginx后面时，可设置环境变量 X_ACCEL_REDIRECT_PREFIX=/internal_export/，
+由nginx直接发送导出文件：
+
+    location /internal_export/ {
+        internal;
+        alias /path/to/AIFI/exports/;
+    }
+"""
+
+import logging
+
+from app import app, init_data
+
+__all__ = ['app']
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(name)s: %(message)s')
+
+init_data()